@@ -0,0 +1,56 @@
+"""Bytes per AST node: slotted, interned ASTNode vs the former kwargs/__dict__ node.
+
+Usage: python benchmarks/ast_memory.py [--nodes N]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from symbolnav import ASTNode
+
+
+class LegacyASTNode:
+    """The node layout before ASTNode was slotted: per-instance __dict__ plus a kwargs dict."""
+
+    def __init__(self, node_type: str, **kwargs):
+        self.node_type = node_type
+        self.attributes = kwargs
+
+
+def build(node_cls, count: int, distinct: bool) -> list:
+    nodes = []
+    for i in range(count):
+        letter = f"x{i}" if distinct else "x"
+        symbol = node_cls('Symbol', symbol=letter, symbol_type='letter')
+        sup = node_cls('Supscript', value=node_cls('Symbol', symbol='l', symbol_type='letter'))
+        sub = node_cls('Subscript', value=node_cls('Symbol', symbol='t', symbol_type='letter'))
+        nodes.append(node_cls('SymbolPostfix', symbol=symbol, postfix=frozenset((sup, sub))))
+    return nodes
+
+
+def measure(node_cls, count: int, distinct: bool) -> float:
+    gc.collect()
+    tracemalloc.start()
+    nodes = build(node_cls, count, distinct)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del nodes
+    # Each iteration constructs 6 nodes (x, l, t, ^, _, postfix)
+    return current / (count * 6)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for distinct in (True, False):
+        label = "distinct symbols" if distinct else "repeated symbols"
+        legacy = measure(LegacyASTNode, args.nodes, distinct)
+        compact = measure(ASTNode, args.nodes, distinct)
+        print(f"{label:<17}: legacy {legacy:7.1f} B/node, compact {compact:7.1f} B/node "
+              f"({legacy / compact:4.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
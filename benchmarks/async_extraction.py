@@ -0,0 +1,60 @@
+"""Throughput of `AsyncExtractor` with many concurrent documents on one event loop.
+
+Extracts FILE as `--documents` concurrent requests, then streams them through
+`iter_occurrences`, checking both against the synchronous pipeline. The event loop's
+responsiveness is measured by a ticker task that should wake up every millisecond.
+
+Usage: python benchmarks/async_extraction.py FILE [--documents N] [--workers W]
+"""
+import argparse
+import asyncio
+import time
+
+from symbolnav import AsyncExtractor, ParseCache, SymbolExtractor, iter_occurrences, iter_spans
+
+
+async def ticker(delays: list[float]):
+    # Largest delay of a 1 ms sleep, i.e. how long the loop was blocked
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        delays.append(time.perf_counter() - start - 0.001)
+
+
+async def run(args, reference: list):
+    delays: list[float] = []
+    tick = asyncio.create_task(ticker(delays))
+    async with AsyncExtractor(max_workers=args.workers) as extractor:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            extractor.extract_file(args.file, ignore_errors=True) for _ in range(args.documents)
+        ))
+        elapsed = time.perf_counter() - start
+        assert all([(o.symbol, o.line, o.column) for o in result] == reference for result in results)
+        print(f"{args.documents} concurrent documents: {elapsed * 1000:.0f} ms, "
+              f"loop blocked at most {max(delays, default=0) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        count = 0
+        async for _ in extractor.iter_occurrences([args.file] * args.documents, ignore_errors=True):
+            count += 1
+        elapsed = time.perf_counter() - start
+        assert count == len(reference) * args.documents
+        print(f"streamed {count} occurrences: {elapsed * 1000:.0f} ms")
+    tick.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    symbol_extractor = SymbolExtractor(cache=ParseCache())
+    reference = [(o.symbol, o.line, o.column) for o in iter_occurrences(iter_spans([args.file]), symbol_extractor, ignore_errors=True)]
+    asyncio.run(run(args, reference))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Build time and memory of the corpus index from synthetic document shards.
+
+Writes DOCUMENTS shards of Zipf-distributed symbols, merges them into a corpus index in
+one pass and with a small fan-in (several passes), checks both against the counts kept
+in memory, and times top-k and document queries.
+
+Usage: python benchmarks/corpus_index.py [--documents N] [--symbols S] [--fan-in F]
+"""
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from symbolnav.corpus_index import CorpusIndex, write_shard
+
+
+def fingerprint(latex: str) -> str:
+    # Stands in for the fingerprint of the symbol's node
+    return hashlib.blake2b(latex.encode(), digest_size=16).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--symbols", type=int, default=300, help="occurrences per document")
+    parser.add_argument("--fan-in", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [f"x^{{{i}}}_{{t}}" for i in range(20000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    totals: Counter[str] = Counter()
+    with tempfile.TemporaryDirectory() as directory:
+        shards = []
+        for document in range(args.documents):
+            counts = Counter(rng.choices(vocabulary, weights, k=args.symbols))
+            totals.update(counts)
+            path = os.path.join(directory, f"{document}.shard")
+            write_shard(path, f"doc{document}", Counter({(fingerprint(latex), latex): n for latex, n in counts.items()}))
+            shards.append(path)
+
+        for fan_in in (len(shards), args.fan_in):
+            tracemalloc.start()
+            start = time.perf_counter()
+            index = CorpusIndex.build(shards, os.path.join(directory, f"index_{fan_in}.sqlite"), fan_in=fan_in)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"fan-in {fan_in:>5}: {elapsed * 1000:8.0f} ms, peak {peak / 1e6:.1f} MB, "
+                  f"{len(index)} symbols in {index.document_count()} documents")
+            assert {symbol.latex: symbol.occurrences for symbol in index.top(len(totals))} == dict(totals)
+
+            start = time.perf_counter()
+            top = index.top(20)
+            users = index.documents(top[0].fingerprint)
+            elapsed = time.perf_counter() - start
+            assert len(users) == top[0].documents
+            print(f"top-20 and the {len(users)} documents using {top[0].latex}: {elapsed * 1000:.1f} ms")
+            index.close()
+
+
+if __name__ == "__main__":
+    main()
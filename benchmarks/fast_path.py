@@ -0,0 +1,75 @@
+"""Share and speed of the fast path for trivial math, and a check that it matches the parser.
+
+Parses each distinct math source of FILE with the fast path and the LALR parser and with
+the parser alone, and checks that the fast path builds exactly the parser's tree. Then
+checks the same on random sources made of the tokens the fast path knows, including
+sources the parser rejects, which the fast path must leave to it.
+
+Usage: python benchmarks/fast_path.py FILE [--random N] [--seed S]
+"""
+import argparse
+import random
+import time
+
+from symbolnav import LaTeXMathExtractor, MathSyntaxError, MathValueError, SymbolExtractor
+from symbolnav.symbol_extractor.fast_path import parse_trivial
+
+TOKENS = [
+    'x', 'y', 'T', '0', '1', r'\alpha', r'\Omega', r'\varphi', r'\bm', r'\mathbb', r'\hat',
+    '+', '-', '=', ',', '.', '|', '\\\\', r'\cdot', r'\le', r'\leq', r'\infty', r'\frac', r'\text',
+    '_', '^', "'", '{', '}', ' ', r'\alpha b', r'\alphab', r'\bmp', r'\sum', '(', ')',
+]
+
+
+def parse(extractor: SymbolExtractor, latex: str):
+    try:
+        return True, extractor.interpreter.parse(latex, file="", line=1, column=1)
+    except (MathSyntaxError, MathValueError, SyntaxError):
+        return False, None
+
+
+def check(extractor: SymbolExtractor, latex: str) -> bool:
+    """Whether `latex` took the fast path; fails if the fast path disagrees with the parser."""
+    fast = parse_trivial(latex)
+    if fast is None:
+        return False
+    ok, ast = parse(extractor, latex)
+    assert ok, f"Fast path accepted {latex!r}, which the parser rejects"
+    assert fast == ast, f"Fast path built {fast!r} for {latex!r}, the parser {ast!r}"
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file")
+    parser.add_argument("--random", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.file) as f:
+        sources = list(dict.fromkeys(latex_math.value for latex_math in LaTeXMathExtractor().analyze(latex=f.read())))
+
+    extractor = SymbolExtractor()
+    start = time.perf_counter()
+    for latex in sources:
+        extractor._parse(latex, file="", line=1, column=1)
+    tiered = time.perf_counter() - start
+    start = time.perf_counter()
+    for latex in sources:
+        parse(extractor, latex)
+    parser_only = time.perf_counter() - start
+    print(f"{len(sources)} distinct sources: {extractor.counters['fast_path']} fast path, "
+          f"{extractor.counters['parser']} parser ({extractor.fast_path_ratio:.0%} fast path)")
+    print(f"parse: {tiered * 1000:.0f} ms tiered, {parser_only * 1000:.0f} ms parser only")
+    assert sum(check(extractor, latex) for latex in sources) == extractor.counters['fast_path']
+
+    rng = random.Random(args.seed)
+    accepted = 0
+    for _ in range(args.random):
+        latex = ''.join(rng.choice(TOKENS) for _ in range(rng.randint(1, 8)))
+        accepted += check(extractor, latex)
+    print(f"{args.random} random sources: {accepted} took the fast path, all match the parser")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Parse time of a single group as its number of items grows.
+
+With linear accumulation of `group` items the time per item stays flat.
+
+Usage: python benchmarks/group_scaling.py [--sizes 100 200 400 ...]
+"""
+import argparse
+import time
+
+from symbolnav import LaTeXMathInterpreter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[250, 500, 1000, 2000, 4000, 8000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    interpreter = LaTeXMathInterpreter()
+    for size in args.sizes:
+        latex = " + ".join(["x^l_t"] * size)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            interpreter.parse(latex, file="benchmark", line=1, column=1)
+            best = min(best, time.perf_counter() - start)
+        print(f"{size:>6} items: {best * 1000:8.1f} ms, {best / size * 1e6:6.2f} us/item")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Full vs incremental analysis of a document after a one-character edit.
+
+Usage: python benchmarks/incremental.py FILE [--edits N]
+"""
+import argparse
+import time
+
+from symbolnav import LaTeXMathExtractor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file")
+    parser.add_argument("--edits", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.file) as f:
+        source = f.read()
+    extractor = LaTeXMathExtractor()
+    table = extractor.update(None, latex=source)
+    print(f"{len(source) / 1e6:.2f} MB, {len(table.spans)} math spans")
+
+    for edit in range(1, args.edits + 1):
+        # Insert a term into the first math span after the edit point
+        pos = source.index('$', len(source) * edit // (args.edits + 1)) + 1
+        source = source[:pos] + 'y+' + source[pos:]
+
+        start = time.perf_counter()
+        full = list(extractor.analyze(latex=source))
+        full_time = time.perf_counter() - start
+        start = time.perf_counter()
+        table = extractor.update(table, latex=source)
+        incremental_time = time.perf_counter() - start
+
+        assert table.spans == full, "Incremental result differs from a full analysis"
+        print(f"edit at {pos / len(source):4.0%}: full {full_time * 1000:8.1f} ms, "
+              f"incremental {incremental_time * 1000:7.1f} ms ({full_time / incremental_time:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
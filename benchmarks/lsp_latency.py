@@ -0,0 +1,124 @@
+"""Latency of the language server while typing in a document, measured from a local client.
+
+Starts `snav lsp`, opens FILE, types into math spans spread over the document one
+character at a time and times each edit until its diagnostics arrive. Then hovers on,
+jumps to the definition of and lists the references of a symbol in each of those spans.
+
+With `--budget`, exits with an error if the median keystroke takes longer.
+
+Usage: python benchmarks/lsp_latency.py FILE [--keystrokes N] [--budget MS]
+"""
+import argparse
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+
+from symbolnav import LaTeXMathExtractor
+from symbolnav.lsp import read_message, write_message
+
+
+class Client:
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "symbolnav.cli", "lsp"], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        self.next_id = 0
+
+    def notify(self, method: str, params: dict):
+        write_message(self.process.stdin, {"jsonrpc": "2.0", "method": method, "params": params})
+
+    def request(self, method: str, params: dict):
+        self.next_id += 1
+        write_message(self.process.stdin, {"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params})
+        while True:
+            message = read_message(self.process.stdout)
+            if message.get("id") == self.next_id:
+                assert "error" not in message, message["error"]
+                return message["result"]
+
+    def diagnostics(self) -> list:
+        while True:
+            message = read_message(self.process.stdout)
+            if message.get("method") == "textDocument/publishDiagnostics":
+                return message["params"]["diagnostics"]
+
+    def close(self) -> int:
+        self.request("shutdown", {})
+        self.notify("exit", {})
+        return self.process.wait()
+
+
+def position(text: str, offset: int) -> dict:
+    line = text.count("\n", 0, offset)
+    return {"line": line, "character": offset - (text.rfind("\n", 0, offset) + 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file")
+    parser.add_argument("--keystrokes", type=int, default=50)
+    parser.add_argument("--budget", type=float, default=None, help="most milliseconds the median keystroke may take")
+    args = parser.parse_args()
+
+    with open(args.file) as f:
+        text = f.read()
+    uri = pathlib.Path(os.path.abspath(args.file)).as_uri()
+    client = Client()
+    client.request("initialize", {"processId": os.getpid(), "rootUri": None, "capabilities": {}})
+    client.notify("initialized", {})
+
+    start = time.perf_counter()
+    client.notify("textDocument/didOpen", {"textDocument": {"uri": uri, "languageId": "latex", "version": 0, "text": text}})
+    diagnostics = client.diagnostics()
+    open_time = time.perf_counter() - start
+    print(f"{len(text) / 1e6:.2f} MB: open {open_time * 1000:.0f} ms, {len(diagnostics)} diagnostics")
+
+    # At the start of math at several places of the document, type `+y` then delete it again
+    spans = list(LaTeXMathExtractor().analyze(latex=text))
+    places = [spans[len(spans) * place // 10] for place in range(10)]
+    latencies, positions = [], []
+    for keystroke in range(args.keystrokes):
+        latex_math = places[keystroke // 4 % len(places)]
+        offset = latex_math.span[0] + len(latex_math.marks[0])
+        edit = [("+", 0), ("y", 1), ("", 1), ("", 0)][keystroke % 4]
+        new_text, at = edit
+        change_start = offset + at
+        change_end = change_start + (0 if new_text else 1)
+        range_ = {"start": position(text, change_start), "end": position(text, change_end)}
+        text = text[:change_start] + new_text + text[change_end:]
+        start = time.perf_counter()
+        client.notify("textDocument/didChange", {
+            "textDocument": {"uri": uri, "version": keystroke + 1},
+            "contentChanges": [{"range": range_, "text": new_text}],
+        })
+        client.diagnostics()
+        latencies.append(time.perf_counter() - start)
+        positions.append(offset)
+
+    print(f"{args.keystrokes} keystrokes: median {statistics.median(latencies) * 1000:.1f} ms, "
+          f"max {max(latencies) * 1000:.1f} ms")
+
+    for offset in sorted(set(positions))[:3]:
+        params = {"textDocument": {"uri": uri}, "position": position(text, offset)}
+        start = time.perf_counter()
+        hover = client.request("textDocument/hover", params)
+        definition = client.request("textDocument/definition", params)
+        references = client.request("textDocument/references", params)
+        elapsed = time.perf_counter() - start
+        title = hover["contents"]["value"].splitlines()[0] if hover else None
+        first = definition["range"]["start"] if definition else None
+        print(f"at {params['position']}: {title}, definition {first}, "
+              f"{len(references or [])} references ({elapsed * 1000:.1f} ms for the three)")
+
+    assert client.close() == 0, "Server did not exit cleanly"
+    if args.budget is not None:
+        median = statistics.median(latencies) * 1000
+        assert median <= args.budget, f"Median keystroke took {median:.1f} ms, over the budget of {args.budget:g} ms"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Symbol extraction time of a document with 1..N worker processes.
+
+Each run starts from an empty in-memory parse cache, so every distinct span is parsed once.
+
+Usage: python benchmarks/parallel.py FILE [--jobs 1 2 4 ...]
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from symbolnav import LaTeXMathExtractor, ParseCache, SymbolExtractor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file")
+    parser.add_argument("--jobs", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    latex_maths = list(LaTeXMathExtractor().analyze(file=args.file))
+    sources = [(math.value, args.file, math.line, math.column) for math in latex_maths]
+    print(f"{len(sources)} math spans, {len(set(source[0] for source in sources))} distinct")
+
+    reference = None
+    for jobs in args.jobs:
+        extractor = SymbolExtractor(cache=ParseCache(maxsize=len(sources)))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = extractor.extract_batch(sources, jobs=jobs, ignore_errors=True)
+        elapsed = time.perf_counter() - start
+        reference = reference or result
+        assert result == reference, "Parallel result differs from the serial one"
+        print(f"{jobs:>3} jobs: {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Math span scanning throughput (MB/s) of the regex scanner vs the PLY lexer.
+
+"spans" times finding the math spans alone, "analyze" the full LaTeXMath records
+(positions and contexts included).
+
+Usage: python benchmarks/scan_throughput.py FILE [FILE ...] [--repeat N]
+"""
+import argparse
+import time
+from typing import Callable
+
+from symbolnav import LaTeXMathExtractor
+from symbolnav.latex_math_extractor.scanner import MathScanner
+
+
+def best_time(run: Callable[[], list], repeat: int) -> tuple[float, list]:
+    best, result = float("inf"), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def ply_spans(lexer, latex: str) -> list:
+    lexer.input(latex)
+    lexer.begin('INITIAL')
+    return [(tok.mark_start_pos, tok.mark_end_pos) for tok in iter(lexer.token, None) if tok.type.startswith('MATH_')]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ply, scan = LaTeXMathExtractor(engine="ply"), LaTeXMathExtractor(engine="scan")
+    scanner = MathScanner(ply.lexer)
+    for file in args.files:
+        with open(file) as f:
+            latex = f.read()
+        size = len(latex.encode()) / 1e6
+        print(f"{file}: {size:.2f} MB")
+        benchmarks = {
+            "spans": (
+                lambda: ply_spans(ply.lexer, latex),
+                lambda: [(span.mark_start_pos, span.mark_end_pos) for span in scanner.scan(latex)],
+            ),
+            "analyze": (lambda: list(ply.analyze(latex=latex)), lambda: list(scan.analyze(latex=latex))),
+        }
+        for name, (run_ply, run_scan) in benchmarks.items():
+            ply_time, ply_result = best_time(run_ply, args.repeat)
+            scan_time, scan_result = best_time(run_scan, args.repeat)
+            assert ply_result == scan_result, "Engines disagree"
+            print(f"  {name:<8}: ply {size / ply_time:8.2f} MB/s, scan {size / scan_time:8.2f} MB/s "
+                  f"({ply_time / scan_time:5.1f}x), {len(scan_result)} spans")
+
+
+if __name__ == "__main__":
+    main()
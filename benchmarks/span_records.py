@@ -0,0 +1,47 @@
+"""Time and memory of the LaTeXMath records of a document.
+
+Reports the analysis time, the memory held by the records and the time to read every
+`value` and `contexts`, which are sliced from the source on access.
+
+Usage: python benchmarks/span_records.py FILE
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from symbolnav import LaTeXMathExtractor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file")
+    args = parser.parse_args()
+
+    with open(args.file) as f:
+        latex = f.read()
+    extractor = LaTeXMathExtractor()
+
+    start = time.perf_counter()
+    spans = list(extractor.analyze(latex=latex))
+    analyze_time = time.perf_counter() - start
+    del spans
+
+    gc.collect()
+    tracemalloc.start()
+    spans = list(extractor.analyze(latex=latex))
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for span in spans:
+        span.value, span.contexts
+    access_time = time.perf_counter() - start
+
+    print(f"{len(latex) / 1e6:.2f} MB, {len(spans)} spans: analyze {analyze_time * 1000:.1f} ms, "
+          f"records {memory / 1e6:.2f} MB ({memory / len(spans):.0f} B/span), "
+          f"value+contexts of all spans {access_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
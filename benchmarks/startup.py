@@ -0,0 +1,44 @@
+"""Startup time of `snav` with a cold and a warm PLY table cache.
+
+Usage: python benchmarks/startup.py [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+STARTUP = (
+    "from symbolnav import LaTeXMathExtractor, SymbolExtractor;"
+    "LaTeXMathExtractor(); SymbolExtractor()"
+)
+
+
+def timed_run(cache_dir: str) -> float:
+    env = dict(os.environ, SYMBOLNAV_CACHE_DIR=cache_dir)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", STARTUP], env=env, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    cold, warm = [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold.append(timed_run(cache_dir))
+            warm.append(timed_run(cache_dir))
+    uncached = [timed_run("") for _ in range(args.runs)]
+
+    for name, times in (("no cache", uncached), ("cold", cold), ("warm", warm)):
+        print(f"{name:<10}: median {statistics.median(times) * 1000:7.1f} ms, "
+              f"min {min(times) * 1000:7.1f} ms over {len(times)} runs")
+
+
+if __name__ == "__main__":
+    main()
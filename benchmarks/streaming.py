@@ -0,0 +1,60 @@
+"""Throughput and peak memory of writing the symbol occurrences of a file as NDJSON.
+
+Compares the streaming pipeline, which reads the file in chunks, with analyzing the
+whole file first. Each run parses with its own in-memory parse cache, and the peak
+memory is measured on a second run as tracing slows the first down.
+
+Usage: python benchmarks/streaming.py FILE [--chunk-size N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+import tracemalloc
+
+from symbolnav import LaTeXMathExtractor, ParseCache, SymbolExtractor, iter_occurrences, iter_spans, write_ndjson
+
+
+class _Discard(io.TextIOBase):
+
+    def write(self, s):
+        return len(s)
+
+
+def _run(spans) -> int:
+    extractor = SymbolExtractor(cache=ParseCache())
+    with contextlib.redirect_stdout(io.StringIO()):
+        return write_ndjson(iter_occurrences(spans(), extractor, ignore_errors=True), _Discard())
+
+
+def _measure(spans):
+    start = time.perf_counter()
+    count = _run(spans)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    _run(spans)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20)
+    args = parser.parse_args()
+    size = os.path.getsize(args.file) / 1e6
+
+    runs = {
+        "whole file": lambda: ((args.file, span) for span in list(LaTeXMathExtractor().analyze(file=args.file))),
+        "streaming": lambda: iter_spans([args.file], chunk_size=args.chunk_size),
+    }
+    for name, spans in runs.items():
+        count, elapsed, peak = _measure(spans)
+        print(f"{name:>10}: {count} records, {elapsed:.2f} s ({size / elapsed:.2f} MB/s), "
+              f"peak {peak / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
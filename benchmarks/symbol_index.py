@@ -0,0 +1,56 @@
+"""Checking out a symbol by re-extracting the whole document vs from the symbol index.
+
+The index is built in a temporary directory; the parse cache is in memory and warm for
+both, so the comparison is between re-running the pipeline and reading the index.
+
+Usage: python benchmarks/symbol_index.py FILE [--rank N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from symbolnav import (
+    LaTeXMathExtractor, ParseCache, SymbolExtractor, SymbolIndex, aggregate, iter_occurrences, sort_symbols
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("file")
+    parser.add_argument("--rank", type=int, default=0)
+    args = parser.parse_args()
+    symbol_extractor = SymbolExtractor(cache=ParseCache(maxsize=1 << 20))
+
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        path = os.path.join(directory, "index.sqlite")
+        start = time.perf_counter()
+        index = SymbolIndex(path)
+        index.update([args.file], symbol_extractor)
+        build_time = time.perf_counter() - start
+        index.close()
+
+        start = time.perf_counter()
+        spans = ((args.file, span) for span in LaTeXMathExtractor().analyze(file=args.file))
+        symbols = aggregate(iter_occurrences(spans, symbol_extractor, ignore_errors=True))
+        symbol = sort_symbols(symbols)[args.rank]
+        full = [(file, latex_math.contexts) for (file, _, _), latex_math in symbols[symbol].items()]
+        full_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = SymbolIndex(path)
+        index.update([args.file], symbol_extractor)
+        indexed = [(file, latex_math.contexts) for file, latex_math in index.occurrences(args.rank)]
+        index_time = time.perf_counter() - start
+        index.close()
+
+    assert indexed == full, "Index differs from a full extraction"
+    print(f"{len(full)} occurrences of symbol [{args.rank}]: index build {build_time * 1000:.1f} ms, "
+          f"full extraction {full_time * 1000:.1f} ms, from index {index_time * 1000:.1f} ms "
+          f"({full_time / index_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Scanning and symbol extraction time of documents with 1..N worker threads.
+
+Documents are scanned by threads sharing one `LaTeXMathExtractor`, then the symbols of all
+their math are extracted with `extract_batch(..., threads=True)`, each run from an empty
+in-memory parse cache. Results are checked against a serial run. Threads only run in
+parallel on a free-threaded build (python3.13t), where the speedup should be near-linear
+in the number of cores; with the GIL they show the overhead of the thread pool.
+
+Usage: python benchmarks/threads.py FILE... [--threads 1 2 4 ...] [--repeat N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from symbolnav import LaTeXMathExtractor, ParseCache, SymbolExtractor
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--threads", type=int, nargs="+", default=sorted({1, 2, 4, 8, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=4, help="scan each file this many times")
+    args = parser.parse_args()
+
+    gil = sys._is_gil_enabled() if hasattr(sys, "_is_gil_enabled") else True
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, {os.cpu_count()} CPUs")
+    texts = []
+    for file in args.files:
+        with open(file) as f:
+            texts.append(f.read())
+    texts *= args.repeat
+
+    extractor = LaTeXMathExtractor()
+    extractor.out = io.StringIO()
+    reference = None
+    for threads in args.threads:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            result = list(executor.map(lambda text: [math.value for math in extractor.analyze(latex=text)], texts))
+        elapsed = time.perf_counter() - start
+        reference = reference or result
+        assert result == reference, "Threaded scan differs from the serial one"
+        print(f"scan    {threads:>3} threads: {elapsed * 1000:8.1f} ms")
+
+    sources = [(value, "input", 1, 1) for values in reference for value in values]
+    print(f"{len(sources)} math spans, {len(set(source[0] for source in sources))} distinct")
+    reference = None
+    for threads in args.threads:
+        symbol_extractor = SymbolExtractor(cache=ParseCache(maxsize=len(sources)))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = symbol_extractor.extract_batch(sources, jobs=threads, ignore_errors=True, threads=True)
+        elapsed = time.perf_counter() - start
+        reference = reference or result
+        assert result == reference, "Threaded result differs from the serial one"
+        print(f"extract {threads:>3} threads: {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,65 @@
-from .latex_math_extractor import *
-from .symbol_extractor import *
-from .renderer import Renderer
+import importlib
+from typing import TYPE_CHECKING
+
+# Module defining each public name. Modules are imported on first access, so the `snav`
+# client can hand a command to a running daemon without loading the extractors.
+_exports = {
+    "MathSyntaxError": ".symbol_extractor",
+    "MathValueError": ".symbol_extractor",
+    "LaTeXValueError": ".latex_math_extractor",
+    "LaTeXMath": ".latex_math_extractor",
+    "LaTeXMathExtractor": ".latex_math_extractor",
+    "SpanTable": ".latex_math_extractor",
+    "lexer": ".latex_math_extractor",
+    "analyze_file": ".latex_math_extractor",
+    "analyze_files": ".latex_math_extractor",
+    "resolve_includes": ".latex_math_extractor",
+    "SymbolExtractor": ".symbol_extractor",
+    "ParseCache": ".symbol_extractor",
+    "CachedError": ".symbol_extractor",
+    "LaTeXMathInterpreter": ".symbol_extractor",
+    "register_command": ".symbol_extractor",
+    "TOKEN_TYPES": ".symbol_extractor",
+    "TokenColumns": ".symbol_extractor",
+    "tokenize_many": ".symbol_extractor",
+    "parse_columns": ".symbol_extractor",
+    "ASTNode": ".symbol_extractor",
+    "fingerprint": ".symbol_extractor",
+    "sort_key": ".symbol_extractor",
+    "sort_symbols": ".symbol_extractor",
+    "to_dict": ".symbol_extractor",
+    "Renderer": ".renderer",
+    "Occurrence": ".pipeline",
+    "iter_spans": ".pipeline",
+    "iter_occurrences": ".pipeline",
+    "aggregate": ".pipeline",
+    "write_ndjson": ".pipeline",
+    "SymbolIndex": ".index",
+    "AsyncExtractor": ".aio",
+    "read_bundle": ".corpus",
+    "find_main": ".corpus",
+    "process_corpus": ".corpus",
+    "CorpusIndex": ".corpus_index",
+}
+
+if TYPE_CHECKING:
+    from .latex_math_extractor import *
+    from .symbol_extractor import *
+    from .renderer import Renderer
+    from .pipeline import Occurrence, aggregate, iter_occurrences, iter_spans, write_ndjson
+    from .index import SymbolIndex
+    from .aio import AsyncExtractor
+    from .corpus import find_main, process_corpus, read_bundle
+    from .corpus_index import CorpusIndex
+
+
+def __getattr__(name: str):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_exports[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     "MathSyntaxError",
@@ -8,9 +67,34 @@ __all__ = [
     "LaTeXValueError",
     "LaTeXMath",
     "LaTeXMathExtractor",
+    "SpanTable",
+    "analyze_file",
+    "analyze_files",
+    "resolve_includes",
     "SymbolExtractor",
+    "ParseCache",
+    "CachedError",
     "LaTeXMathInterpreter",
+    "register_command",
+    "TOKEN_TYPES",
+    "TokenColumns",
+    "tokenize_many",
+    "parse_columns",
     "ASTNode",
+    "fingerprint",
+    "sort_key",
+    "sort_symbols",
     "to_dict",
     "Renderer",
-]
\ No newline at end of file
+    "Occurrence",
+    "iter_spans",
+    "iter_occurrences",
+    "aggregate",
+    "write_ndjson",
+    "SymbolIndex",
+    "AsyncExtractor",
+    "read_bundle",
+    "find_main",
+    "process_corpus",
+    "CorpusIndex",
+]
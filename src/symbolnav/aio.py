@@ -0,0 +1,136 @@
+"""Asyncio counterparts of the extractors, for running SymbolNav inside an event loop.
+
+Files are read and math is scanned and parsed on a bounded pool of worker threads, which
+the extractors can share. At most `max_pending` calls are queued on the pool: further
+callers wait for a slot, so a burst of documents applies backpressure instead of piling up
+work. Cancelling a call drops its queued work; a batch already running finishes on its
+thread, and its result is discarded.
+"""
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import batched
+from typing import AsyncIterator, Callable, Iterable, Optional, TypeVar
+
+from .latex_math_extractor import LaTeXMath, LaTeXMathExtractor
+from .pipeline import BATCH_SIZE, Occurrence
+from .symbol_extractor import ASTNode, ParseCache, SymbolExtractor
+
+T = TypeVar('T')
+
+
+class AsyncExtractor:
+    """Scans documents and extracts their symbols without blocking the event loop.
+
+    Without a `symbol_extractor`, symbols are parsed with an in-memory parse cache shared by
+    all documents. Use it as an async context manager, or call `close` when done, to shut
+    the pool down.
+    """
+
+    def __init__(
+        self,
+        symbol_extractor: Optional[SymbolExtractor] = None,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ):
+        self.symbol_extractor = symbol_extractor or SymbolExtractor(cache=ParseCache())
+        self.math_extractor = LaTeXMathExtractor()
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='symbolnav')
+        self.max_pending = max_pending or 2 * max_workers
+        self._slots = asyncio.Semaphore(self.max_pending)
+
+    async def __aenter__(self) -> 'AsyncExtractor':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        # Queued work is dropped, running batches are waited for off the event loop
+        await asyncio.to_thread(self.executor.shutdown, wait=True, cancel_futures=True)
+
+    async def _run(self, function: Callable[..., T], *args) -> T:
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def read(self, file: str) -> str:
+        """Content of `file`, read on the pool."""
+        return await self._run(_read_text, file)
+
+    async def analyze(self, latex: Optional[str] = None, file: Optional[str] = None) -> list[LaTeXMath]:
+        """Math spans of `latex`, or of `file` read on the pool, like `LaTeXMathExtractor.analyze`."""
+        if latex is None and file is not None:
+            latex = await self.read(file)
+        return await self._run(_analyze, self.math_extractor, latex, file)
+
+    async def extract_symbol(
+        self, latex: str, file: str, line: int, column: int, ignore_errors: bool = False
+    ) -> tuple[ASTNode, ...]:
+        """Symbols of one math source, like `SymbolExtractor.extract_symbol`."""
+        return await self._run(_extract, self.symbol_extractor, latex, file, line, column, ignore_errors)
+
+    async def extract_file(self, file: str, ignore_errors: bool = False) -> list[Occurrence]:
+        """Symbol occurrences of `file`, in span order.
+
+        Spans are parsed in batches of `BATCH_SIZE`, so a large document neither holds a
+        worker for long nor keeps running once its caller is cancelled.
+        """
+        occurrences = []
+        for batch in batched(await self.analyze(file=file), BATCH_SIZE):
+            extracted = await self._run(_extract_batch, self.symbol_extractor, file, batch, ignore_errors)
+            for latex_math, symbols in zip(batch, extracted):
+                occurrences.extend(Occurrence(symbol, file, latex_math) for symbol in symbols)
+        return occurrences
+
+    async def iter_occurrences(
+        self, files: Iterable[str], ignore_errors: bool = False, window: Optional[int] = None
+    ) -> AsyncIterator[Occurrence]:
+        """Symbol occurrences of each file, in file order, as the files are processed.
+
+        Up to `window` files (`max_pending` by default) are processed ahead of the consumer;
+        the next one starts only as the oldest is consumed. Closing or cancelling the
+        iterator cancels the files in flight.
+        """
+        window = window or self.max_pending
+        pending: deque[asyncio.Task[list[Occurrence]]] = deque()
+        try:
+            for file in files:
+                pending.append(asyncio.create_task(self.extract_file(file, ignore_errors)))
+                if len(pending) >= window:
+                    for occurrence in await pending.popleft():
+                        yield occurrence
+            while pending:
+                for occurrence in await pending.popleft():
+                    yield occurrence
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def _read_text(file: str) -> str:
+    with open(file, 'r') as f:
+        return f.read()
+
+
+def _analyze(extractor: LaTeXMathExtractor, latex: str, file: Optional[str]) -> list[LaTeXMath]:
+    return list(extractor.analyze(latex=latex, file=file))
+
+
+def _extract(
+    extractor: SymbolExtractor, latex: str, file: str, line: int, column: int, ignore_errors: bool
+) -> tuple[ASTNode, ...]:
+    return tuple(extractor.extract_symbol(latex, file, line, column, ignore_errors=ignore_errors))
+
+
+def _extract_batch(
+    extractor: SymbolExtractor, file: str, batch: tuple[LaTeXMath, ...], ignore_errors: bool
+) -> list[tuple[ASTNode, ...]]:
+    return [
+        tuple(extractor.extract_symbol(
+            latex_math.value, file, latex_math.line, latex_math.column, ignore_errors=ignore_errors
+        ))
+        for latex_math in batch
+    ]
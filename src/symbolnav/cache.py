@@ -0,0 +1,105 @@
+import copy
+import functools
+import hashlib
+import importlib.util
+import os
+import sys
+import threading
+from types import ModuleType
+from typing import Optional
+
+import ply.lex as lex
+import ply.yacc as yacc
+
+from .paths import cache_dir
+
+
+def grammar_hash(module: ModuleType, prefix: str) -> str:
+    """Hash of everything PLY reads from `module` to build its tables (rules prefixed by `prefix`)."""
+    parts = [lex.__version__, lex.__tabversion__, yacc.__tabversion__]
+    for name in sorted(vars(module)):
+        if not (name.startswith(prefix) or name in ('tokens', 'states', 'precedence', 'start', 'literals', 'COMMANDS')):
+            continue
+        value = getattr(module, name)
+        parts.append(f"{name}={value.__doc__ if callable(value) else value!r}")
+    return hashlib.blake2b('\n'.join(parts).encode(), digest_size=8).hexdigest()
+
+
+def _table_path(directory: str, kind: str, module: ModuleType, prefix: str, ext: str) -> str:
+    name = f"{kind}_{module.__name__.replace('.', '_')}_{grammar_hash(module, prefix)}"
+    return os.path.join(directory, name + ext)
+
+
+def _replace(src: str, dst: str):
+    # Tables are written under a per-process name and moved in place, so concurrent
+    # `snav` invocations never observe a partially written file
+    try:
+        os.replace(src, dst)
+    except OSError:
+        if os.path.exists(src):
+            os.remove(src)
+
+
+@functools.cache
+def _load_lexer(module_name: str) -> lex.Lexer:
+    module = sys.modules[module_name]
+    directory = cache_dir()
+    if directory is None:
+        return lex.lex(module=module)
+
+    lextab_file = _table_path(directory, 'lextab', module, 't_', '.py')
+    if os.path.exists(lextab_file):
+        try:
+            spec = importlib.util.spec_from_file_location(os.path.basename(lextab_file)[:-3], lextab_file)
+            lextab = importlib.util.module_from_spec(spec)  # type: ignore
+            spec.loader.exec_module(lextab)  # type: ignore
+            if getattr(lextab, '_tabversion', None) == lex.__tabversion__:
+                return lex.lex(module=module, optimize=True, lextab=lextab, errorlog=lex.NullLogger())
+        except Exception:
+            pass  # Stale or truncated table, rebuild it below
+
+    lexer = lex.lex(module=module)
+    tmp_name = f"{os.path.basename(lextab_file)[:-3]}_{os.getpid()}"
+    try:
+        lexer.writetab(tmp_name, directory)
+        _replace(os.path.join(directory, tmp_name + '.py'), lextab_file)
+    except OSError:
+        pass
+    return lexer
+
+
+@functools.cache
+def _load_parser(module_name: str, debug: bool) -> yacc.LRParser:
+    module = sys.modules[module_name]
+    directory = cache_dir()
+    if directory is None or debug:
+        return yacc.yacc(module=module, debug=debug, write_tables=False)
+
+    parsetab_file = _table_path(directory, 'parsetab', module, 'p_', '.pickle')
+    if os.path.exists(parsetab_file):
+        try:
+            # PLY checks the grammar signature stored in the pickle and regenerates on mismatch
+            return yacc.yacc(module=module, debug=False, picklefile=parsetab_file, errorlog=yacc.NullLogger())
+        except Exception:
+            pass  # Truncated or unreadable table, rebuild it below
+
+    tmp_file = f"{parsetab_file}.{os.getpid()}"
+    parser = yacc.yacc(module=module, debug=False, picklefile=tmp_file)
+    _replace(tmp_file, parsetab_file)
+    return parser
+
+
+# Tables are built and written once per process, even when threads ask for them at once
+_build_lock = threading.Lock()
+
+
+def build_lexer(module: ModuleType) -> lex.Lexer:
+    """Build the PLY lexer defined in `module`, loading its tables from the cache when valid."""
+    with _build_lock:
+        return _load_lexer(module.__name__).clone()
+
+
+def build_parser(module: ModuleType, debug: bool = False) -> yacc.LRParser:
+    """Build the PLY parser defined in `module`, loading its LALR tables from the cache when valid."""
+    with _build_lock:
+        return copy.copy(_load_parser(module.__name__, debug))
@@ -1,9 +1,18 @@
+import contextlib
+import os
+import sys
+import time
 from typing import Annotated, Literal, Optional, OrderedDict
 
 from rich.text import Text
-from symbolnav import LaTeXMathExtractor
+from symbolnav import resolve_includes
 from symbolnav import SymbolExtractor
+from symbolnav import ParseCache
 from symbolnav import Renderer
+from symbolnav import sort_symbols
+from symbolnav import iter_occurrences, iter_spans, write_ndjson
+from symbolnav import LaTeXMath, SymbolIndex
+from symbolnav import fingerprint
 import tyro
 
 from rich.style import Style
@@ -14,6 +23,40 @@ style_marks = Style(color="#E285B5", bold=True)
 style_context = Style(color="#888888")
 style_value = Style(color="#77BCF1")
 
+
+class Session:
+    """The parse cache, symbol extractor and symbol indexes used by the commands.
+
+    A command normally loads its own session; `snav serve` keeps one for all commands.
+    """
+
+    def __init__(self, cache: ParseCache):
+        self.cache = cache
+        self.symbol_extractor = SymbolExtractor(cache=cache)
+        self.indexes: dict[tuple[str, bool], SymbolIndex] = {}
+
+    @classmethod
+    def load(cls) -> 'Session':
+        return cls(ParseCache(path=ParseCache.default_path()))
+
+    def index(self, file: str, project: bool) -> SymbolIndex:
+        """The symbol index of the document [file], opened once per session."""
+        key = (os.path.realpath(file), project)
+        if key not in self.indexes:
+            self.indexes[key] = SymbolIndex(path=SymbolIndex.default_path(file, project))
+        return self.indexes[key]
+
+    def close(self):
+        for index in self.indexes.values():
+            index.close()
+        if self.cache.path is not None:
+            self.cache.save()
+
+
+# The session of the running `snav serve`, if any
+daemon_session: Optional[Session] = None
+
+
 def main(
     file: Optional[str] = None, 
     /, 
@@ -22,8 +65,13 @@ def main(
     ignore_errors: Annotated[bool, tyro.conf.arg(aliases=("-i",))] = False,
     checkout: Annotated[int, tyro.conf.arg(aliases=("-c",))] = -1,
     latex: Optional[str] = None,
+    jobs: Annotated[int, tyro.conf.arg(aliases=("-j",))] = 1,
+    project: Annotated[bool, tyro.conf.arg(aliases=("-p",))] = False,
+    ndjson: bool = False,
+    watch: Annotated[bool, tyro.conf.arg(aliases=("-w",))] = False,
 ):
-    symbol_extractor = SymbolExtractor()
+    session = daemon_session or Session.load()
+    symbol_extractor = session.symbol_extractor
     symbols = {}
 
     if file is None:
@@ -34,49 +82,219 @@ def main(
             ignore_errors=ignore_errors
         ):
             symbols[symbol] = (1, 1)
-        for symbol in sorted(symbols.keys()):
+        for symbol in sort_symbols(symbols.keys()):
             print(Renderer.to_latex(symbol))
     else:
-        latex_math_extractor = LaTeXMathExtractor()
-        latex_math = list(latex_math_extractor.analyze(file=file))
-        for latex_math in latex_math:
-            for symbol in symbol_extractor.extract_symbol(
-                latex_math.value,
-                file=file,
-                line=latex_math.line,
-                column=latex_math.column,
-                ignore_errors=ignore_errors
-            ):
-                if symbol is None: continue
-                if symbol not in symbols:
-                    symbols[symbol] = OrderedDict()
-                symbols[symbol][(latex_math.line, latex_math.column)] = latex_math
-        sorted_symbols = list(sorted(symbols.keys()))
-        latex_symbols = [Renderer.to_latex(symbol) for symbol in sorted_symbols]
-        if list_symbols:
-            for idx, (latex_symbol, symbol) in enumerate(zip(latex_symbols, sorted_symbols)):
-                start_line, start_column = next(iter(symbols[symbol].keys()))
-                print(f"[{idx:>3}] {latex_symbol:.<50}: in File {file}, line {start_line}, column {start_column}")
-        if latex_table:
-            print(Renderer.to_latex_table(latex_symbols, num_cols=6))
-        
-        if checkout != -1:
-            latex_symbol = latex_symbols[checkout]
-            symbol = sorted_symbols[checkout]
-            console.print(Text(f"Checking out LaTeX Symbol [{checkout:>3}]: ") + Text(latex_symbol, style=style_value) + Text(", appears"))
-            console.print()
-            for line, column in symbols[symbol].keys():
-                console.print(f"in File {file}, line {line}, column {column}", highlight=True)
-                latex_math = symbols[symbol][(line, column)]
-                console.print(latex_math.contexts[0], style=style_context, end="")
-                console.print(latex_math.marks[0], style=style_marks, end="", )
-                console.print(latex_math.value, style=style_value, end="")
-                console.print(latex_math.marks[1], style=style_marks, end="")
-                console.print(latex_math.contexts[1], style=style_context, end="")
-                console.print("\n")
+        # With --project, [file] is the main file and the files it includes are processed too
+        files = resolve_includes(file) if project else [file]
+        if ndjson:
+            # Occurrences are written while the files are scanned, errors go to stderr
+            out = sys.stdout
+            with contextlib.redirect_stdout(sys.stderr):
+                write_ndjson(iter_occurrences(iter_spans(files), symbol_extractor, jobs, ignore_errors), out)
+            if session is not daemon_session:
+                session.close()
+            return
+        index = session.index(file, project)
+        show_index(index, files, symbol_extractor, list_symbols, latex_table, ignore_errors, checkout, jobs)
+        if watch:
+            watch_files(index, file, project, symbol_extractor, list_symbols, latex_table, ignore_errors, checkout, jobs)
+
+    if session is not daemon_session:
+        session.close()
+
+def show_index(
+    index: SymbolIndex, files: list[str], symbol_extractor: SymbolExtractor,
+    list_symbols: bool, latex_table: bool, ignore_errors: bool, checkout: int, jobs: int,
+):
+    # The index is updated for the files that changed, the symbols are then read from it
+    index.update(files, symbol_extractor, jobs=jobs)
+    index.report(ignore_errors)
+    if list_symbols or latex_table:
+        indexed_symbols = index.symbols()
+    if list_symbols:
+        for symbol in indexed_symbols:
+            print(f"[{symbol.rank:>3}] {symbol.latex:.<50}: in File {symbol.file}, line {symbol.line}, column {symbol.column}")
+    if latex_table:
+        print(Renderer.to_latex_table([symbol.latex for symbol in indexed_symbols], num_cols=6))
+
+    if checkout != -1:
+        rank = checkout if checkout >= 0 else len(index) + checkout
+        assert 0 <= rank < len(index), f"No symbol [{checkout}], the document has {len(index)} symbols"
+        console.print(Text(f"Checking out LaTeX Symbol [{checkout:>3}]: ") + Text(index.latex(rank), style=style_value) + Text(", appears"))
+        console.print()
+        print_occurrences(index.occurrences(rank))
+
+def watch_files(
+    index: SymbolIndex, file: str, project: bool, symbol_extractor: SymbolExtractor,
+    list_symbols: bool, latex_table: bool, ignore_errors: bool, checkout: int, jobs: int,
+):
+    # Rebuild whenever the document changes, until Ctrl-C; a burst of saves is one rebuild
+    from symbolnav.watch import Watcher
+    files = resolve_includes(file) if project else [file]
+    watcher = Watcher(files)
+    try:
+        while True:
+            changed = watcher.wait()
+            names = {os.path.realpath(name): name for name in files}
+            console.rule(", ".join(sorted(names.get(path, path) for path in changed)) + " changed", style=style_context)
+            try:
+                # Includes may have been added or removed
+                files = resolve_includes(file) if project else [file]
+                watcher.watch(files)
+                show_index(index, files, symbol_extractor, list_symbols, latex_table, ignore_errors, checkout, jobs)
+            except (AssertionError, OSError) as e:
+                # e.g. the file is being replaced or the checked out symbol is gone; wait for the next save
+                console.print(str(e), style=style_marks)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+def query(
+    symbol: str,
+    file: str,
+    /,
+    ignore_errors: Annotated[bool, tyro.conf.arg(aliases=("-i",))] = False,
+    jobs: Annotated[int, tyro.conf.arg(aliases=("-j",))] = 1,
+    project: Annotated[bool, tyro.conf.arg(aliases=("-p",))] = False,
+):
+    """Show where `symbol`, written in LaTeX, appears in [file], answering from the symbol index."""
+    session = daemon_session or Session.load()
+    symbol_extractor = session.symbol_extractor
+    files = resolve_includes(file) if project else [file]
+    index = session.index(file, project)
+    index.update(files, symbol_extractor, jobs=jobs)
+    index.report(ignore_errors)
+
+    rank = index.find(symbol)
+    if rank is None:
+        # Not written the way symbols are rendered, e.g. `x^l_t` for `x^{l}_{t}`
+        symbols = list(symbol_extractor.extract_symbol(symbol, file="query", line=1, column=1))
+        if symbols:
+            rank = index.find(Renderer.to_latex(symbols[0]))
+    if rank is None:
+        console.print(Text("LaTeX Symbol ") + Text(symbol, style=style_value) + Text(" does not appear"))
+    else:
+        console.print(Text(f"LaTeX Symbol [{rank:>3}]: ") + Text(index.latex(rank), style=style_value) + Text(", appears"))
+        console.print()
+        print_occurrences(index.occurrences(rank))
+
+    if session is not daemon_session:
+        session.close()
+
+def serve(socket: Optional[str] = None):
+    """Keep a warm session and answer `snav` commands sent to a Unix domain socket.
+
+    While the daemon runs, `snav` hands its commands to it; stop it with Ctrl-C or SIGTERM.
+    """
+    from symbolnav.paths import socket_path
+    from symbolnav.server import serve as serve_socket
+    path = socket or socket_path()
+    assert path is not None, "The daemon is disabled, set SYMBOLNAV_SOCKET or pass --socket"
+    assert daemon_session is None, "Already running as a daemon"
+    serve_socket(path)
+
+def corpus(
+    directory: str,
+    /,
+    out: Annotated[str, tyro.conf.arg(aliases=("-o",))] = "snav-corpus",
+    jobs: Annotated[int, tyro.conf.arg(aliases=("-j",))] = 0,
+    shards: int = 16,
+):
+    """Extract the symbols of every arXiv source bundle in [directory] into NDJSON shards in --out.
+
+    Bundles are read in memory and processed on `jobs` worker processes (0 for all CPUs);
+    counters of each bundle are printed and written to `bundles.ndjson`. The symbol counts
+    of all bundles are merged into the corpus index `index.sqlite`, see `snav corpus-query`.
+    """
+    from symbolnav.corpus import list_bundles, process_corpus
+    bundles = list_bundles(directory)
+    totals = {'bytes': 0, 'spans': 0, 'occurrences': 0, 'failed': 0}
+    start = time.perf_counter()
+    for count, stats in enumerate(process_corpus(bundles, out, jobs=jobs, shards=shards), 1):
+        prefix = Text(f"[{count:>{len(str(len(bundles)))}}/{len(bundles)}] {stats['bundle']}: ")
+        if stats['status'] != 'ok':
+            totals['failed'] += 1
+            console.print(prefix + Text(stats['status'], style=style_marks))
+            continue
+        for key in ('bytes', 'spans', 'occurrences'):
+            totals[key] += stats[key]
+        errors = stats['lex_errors'] + stats['parse_errors'] + stats['missing_includes']
+        console.print(prefix + Text(
+            f"{stats['main']}, {stats['files']} files, {stats['spans']} spans, {stats['occurrences']} symbols, "
+            f"{errors} errors, {stats['bytes'] / max(stats['seconds'], 1e-9) / 1e6:.1f} MB/s",
+            style=style_context if errors else "",
+        ))
+    elapsed = time.perf_counter() - start
+    console.rule(style=style_context)
+    console.print(
+        f"{len(bundles) - totals['failed']} of {len(bundles)} bundles, {totals['spans']} spans, "
+        f"{totals['occurrences']} symbols in {elapsed:.1f} s ({totals['bytes'] / max(elapsed, 1e-9) / 1e6:.1f} MB/s), "
+        f"written to {out}"
+    )
+
+def corpus_query(
+    out: str,
+    symbol: Optional[str] = None,
+    /,
+    top: Annotated[int, tyro.conf.arg(aliases=("-k",))] = 20,
+):
+    """Show the most common symbols of the corpus indexed in [out] by `snav corpus`, or the documents using `symbol`."""
+    from symbolnav.corpus_index import CorpusIndex
+    index_path = os.path.join(out, "index.sqlite")
+    assert os.path.isfile(index_path), f"No corpus index in {out}, run `snav corpus` first"
+    index = CorpusIndex(index_path)
+    try:
+        if symbol is None:
+            console.print(f"{len(index)} symbols in {index.document_count()} documents")
+            for rank, corpus_symbol in enumerate(index.top(top)):
+                print(f"[{rank:>3}] {corpus_symbol.latex:.<50}: {corpus_symbol.occurrences} times in {corpus_symbol.documents} documents")
+            return
+        corpus_symbol = index.find(symbol)
+        if corpus_symbol is None:
+            # Not written the way symbols are rendered, e.g. `x^l_t` for `x^{l}_{t}`
+            symbols = list(SymbolExtractor().extract_symbol(symbol, file="query", line=1, column=1))
+            if symbols:
+                corpus_symbol = index.get(fingerprint(symbols[0]).hex())
+        if corpus_symbol is None:
+            console.print(Text("LaTeX Symbol ") + Text(symbol, style=style_value) + Text(" does not appear"))
+            return
+        console.print(
+            Text("LaTeX Symbol ") + Text(corpus_symbol.latex, style=style_value)
+            + Text(f" appears {corpus_symbol.occurrences} times in {corpus_symbol.documents} documents")
+        )
+        for document, count in index.documents(corpus_symbol.fingerprint, top):
+            print(f"{document:.<50}: {count}")
+    finally:
+        index.close()
+
+def print_occurrences(occurrences: list[tuple[str, LaTeXMath]]):
+    for name, latex_math in occurrences:
+        console.print(f"in File {name}, line {latex_math.line}, column {latex_math.column}", highlight=True)
+        console.print(latex_math.contexts[0], style=style_context, end="")
+        console.print(latex_math.marks[0], style=style_marks, end="", )
+        console.print(latex_math.value, style=style_value, end="")
+        console.print(latex_math.marks[1], style=style_marks, end="")
+        console.print(latex_math.contexts[1], style=style_context, end="")
+        console.print("\n")
+
+def lsp():
+    """Run the language server over stdin and stdout, for editors."""
+    from symbolnav.lsp import LanguageServer
+    sys.exit(LanguageServer(sys.stdin.buffer, sys.stdout.buffer).serve())
+
+def dispatch(args: list[str], prog: Optional[str] = None):
+    """Run the `snav` command line `args`, `prog` being the name it was invoked as."""
+    # Subcommands come first, anything else is a file for `main`
+    commands = {"query": query, "serve": serve, "lsp": lsp, "corpus": corpus, "corpus-query": corpus_query}
+    if args[:1] and args[0] in commands:
+        tyro.cli(commands[args[0]], prog=f"{prog or sys.argv[0]} {args[0]}", args=args[1:])
+    else:
+        tyro.cli(main, prog=prog, args=args)
 
 def run():
-    tyro.cli(main)
+    dispatch(sys.argv[1:])
 
 if __name__ == "__main__":
     run()
\ No newline at end of file
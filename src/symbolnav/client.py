@@ -0,0 +1,64 @@
+"""Entry point of `snav`: hands the command to a running `snav serve` daemon if there is one.
+
+Only the standard library is imported here, so a command answered by the daemon skips
+loading the CLI, the extractors and their tables.
+"""
+from typing import Optional
+import json
+import os
+import shutil
+import socket
+import sys
+
+from .paths import socket_path
+
+
+def receive(connection: socket.socket) -> Optional[dict]:
+    """Read one newline-terminated JSON message, None if the peer closed the connection first."""
+    chunks = []
+    while True:
+        chunk = connection.recv(1 << 16)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        if chunk.endswith(b'\n'):
+            return json.loads(b''.join(chunks))
+
+
+def send(connection: socket.socket, message: dict):
+    connection.sendall(json.dumps(message, ensure_ascii=False).encode() + b'\n')
+
+
+def request(args: list[str], path: str) -> Optional[dict]:
+    """Run `snav args` on the daemon at `path`; None if no daemon is listening there."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(path)
+            send(connection, {
+                'args': args, 'cwd': os.getcwd(), 'prog': sys.argv[0],
+                # So the daemon styles and wraps the output for this terminal
+                'isatty': sys.stdout.isatty(), 'columns': shutil.get_terminal_size().columns,
+            })
+            return receive(connection)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None  # Not running, or a socket left behind by a daemon that did not exit cleanly
+
+
+def run():
+    args = sys.argv[1:]
+    path = socket_path()
+    # The daemon, the language server, corpus commands and --watch run here, they do not go through a daemon
+    local = args[:1] in (['serve'], ['lsp'], ['corpus'], ['corpus-query']) or '--watch' in args or '-w' in args
+    if path is not None and not local and os.path.exists(path):
+        response = request(args, path)
+        if response is not None:
+            sys.stdout.write(response['stdout'])
+            sys.stderr.write(response['stderr'])
+            sys.exit(response['status'])
+
+    from .cli import run
+    run()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,255 @@
+"""Symbols of a corpus of arXiv source bundles, for `snav corpus`.
+
+Each bundle (a `.tar.gz`, `.tar`, or a gzipped single `.tex` as arXiv serves one-file
+submissions) is read in memory, without unpacking it to disk. The main file is the one
+with `\\documentclass` that includes the most other files; the project is then resolved
+from the bundle's own `.tex` members. Bundles are processed on worker processes and their
+occurrences written to one set of NDJSON shards, each symbol always to the same shard,
+together with a record of counters per bundle. The symbol counts of each bundle are also
+written to a document shard, and the document shards merged into a `CorpusIndex`.
+"""
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterator, Mapping, NamedTuple, Optional
+import contextlib
+import gzip
+import io
+import json
+import os
+import re
+import tarfile
+import time
+import zlib
+
+from .latex_math_extractor import LaTeXMathExtractor, resolve_includes
+from .latex_math_extractor.project import strip_comments
+from .corpus_index import CorpusIndex, write_shard
+from .pipeline import render_symbol
+from .symbol_extractor import CachedError, ParseCache, SymbolExtractor, fingerprint
+
+DOCUMENTCLASS_PATTERN = re.compile(r'\\documentclass\b')
+BEGIN_DOCUMENT_PATTERN = re.compile(r'\\begin\s*\{document\}')
+SHARDS = 16
+
+
+class BundleResult(NamedTuple):
+    stats: dict  # Counters of the bundle, one record of `bundles.ndjson`
+    records: list[dict]  # Occurrence records, in document order
+
+
+def read_bundle(path: str) -> dict[str, str]:
+    """The `.tex` files of a source bundle by normalized member path, read in memory."""
+    sources = {}
+    try:
+        # Stream mode reads the members in archive order, without seeking
+        with tarfile.open(path, 'r|*') as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith('.tex'):
+                    sources[os.path.normpath(member.name)] = _decode(tar.extractfile(member).read())
+        return sources
+    except tarfile.ReadError:
+        pass
+    # Not an archive: arXiv serves single-file submissions as a gzipped .tex
+    with gzip.open(path, 'rb') as f:
+        return {'main.tex': _decode(f.read())}
+
+
+def _decode(data: bytes) -> str:
+    # Older submissions are often Latin-1
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin-1')
+
+
+def find_main(sources: Mapping[str, str]) -> Optional[str]:
+    """The main file of a bundle, or None if no file has `\\documentclass`.
+
+    Standalone figures and subfiles have one too, so files with `\\begin{document}` that
+    include the most others win, then the least nested and the first by name.
+    """
+    candidates = []
+    for name, latex in sources.items():
+        latex = strip_comments(latex)
+        if DOCUMENTCLASS_PATTERN.search(latex):
+            with contextlib.redirect_stderr(io.StringIO()):
+                included = len(resolve_includes(name, sources))
+            has_document = BEGIN_DOCUMENT_PATTERN.search(latex) is not None
+            candidates.append((not has_document, -included, name.count(os.sep), name))
+    return min(candidates)[-1] if candidates else None
+
+
+_worker: Optional[tuple[LaTeXMathExtractor, SymbolExtractor]] = None
+
+
+def _init_worker():
+    global _worker
+    # One parse cache per worker, shared by all the bundles it processes
+    _worker = (LaTeXMathExtractor(), SymbolExtractor(cache=ParseCache(maxsize=1 << 16)))
+
+
+def process_bundle(path: str) -> BundleResult:
+    """Occurrences of the symbols of the bundle at `path`, and its counters."""
+    if _worker is None:
+        _init_worker()
+    math_extractor, symbol_extractor = _worker
+    start = time.perf_counter()
+    bundle = os.path.basename(path)
+    stats = {
+        'bundle': bundle, 'status': 'ok', 'main': None, 'files': 0, 'bytes': 0, 'spans': 0,
+        'occurrences': 0, 'missing_includes': 0, 'lex_errors': 0, 'parse_errors': 0, 'seconds': 0.0,
+    }
+    records: list[dict] = []
+    try:
+        sources = read_bundle(path)
+    except (tarfile.TarError, EOFError, OSError, zlib.error) as e:
+        sources = None
+        stats['status'] = f"unreadable: {e}"
+    main = find_main(sources) if sources else None
+    if sources is not None and main is None:
+        stats['status'] = "no main file"
+    if main is not None:
+        stats['main'] = main
+        try:
+            _extract_project(sources, main, math_extractor, symbol_extractor, stats, records)
+        except Exception as e:
+            # One broken bundle must not stop the corpus
+            stats['status'], records = f"failed: {e!r}", []
+        stats['occurrences'] = len(records)
+    stats['seconds'] = time.perf_counter() - start
+    return BundleResult(stats, records)
+
+
+def _extract_project(
+    sources: Mapping[str, str], main: str,
+    math_extractor: LaTeXMathExtractor, symbol_extractor: SymbolExtractor,
+    stats: dict, records: list[dict],
+):
+    warnings = io.StringIO()
+    with contextlib.redirect_stderr(warnings):
+        files = resolve_includes(main, sources)
+    stats['missing_includes'] = warnings.getvalue().count('\n')
+    stats['files'] = len(files)
+    math_extractor.out = io.StringIO()
+    for file in files:
+        latex = sources[file]
+        stats['bytes'] += len(latex)
+        spans = list(math_extractor.analyze(latex=latex))
+        stats['lex_errors'] += math_extractor.error is not None
+        stats['spans'] += len(spans)
+        entries = _entries(symbol_extractor, [
+            (latex_math.value, file, latex_math.line, latex_math.column) for latex_math in spans
+        ])
+        for latex_math, entry in zip(spans, entries):
+            if isinstance(entry, (CachedError, Exception)):
+                stats['parse_errors'] += 1
+                continue
+            for symbol in entry:
+                records.append({
+                    'symbol': render_symbol(symbol),
+                    'fingerprint': fingerprint(symbol).hex(),
+                    'bundle': stats['bundle'],
+                    'file': file,
+                    'line': latex_math.line,
+                    'column': latex_math.column,
+                    'type': latex_math.type,
+                    'math': latex_math.value,
+                })
+
+
+def _entries(symbol_extractor: SymbolExtractor, sources: list[tuple[str, str, int, int]]) -> list:
+    # Math the parser fails on with an exception other than a math error, such as a bare
+    # SyntaxError at the end of the input, only counts as an error of its own span
+    try:
+        return symbol_extractor.extract_entries(sources)
+    except Exception:
+        entries: list = []
+        for source in sources:
+            try:
+                entries.extend(symbol_extractor.extract_entries([source]))
+            except Exception as e:
+                entries.append(e)
+        return entries
+
+
+def list_bundles(directory: str) -> list[str]:
+    """Paths of the bundles in `directory`: every regular file not starting with a dot."""
+    return sorted(
+        entry.path for entry in os.scandir(directory)
+        if entry.is_file() and not entry.name.startswith('.')
+    )
+
+
+class ShardWriter:
+    """Occurrence records written to `shards` NDJSON files, by a stable hash of the symbol.
+
+    The symbol counts of each bundle go to a document shard of their own in `documents/`.
+    """
+
+    def __init__(self, directory: str, shards: int = SHARDS):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'documents'), exist_ok=True)
+        self.document_shards: list[str] = []
+        self.files = [
+            open(os.path.join(directory, f"occurrences-{shard:05d}-of-{shards:05d}.ndjson"), 'w')
+            for shard in range(shards)
+        ]
+        self.bundles = open(os.path.join(directory, 'bundles.ndjson'), 'w')
+
+    def write(self, result: BundleResult):
+        for record in result.records:
+            shard = zlib.crc32(record['symbol'].encode()) % len(self.files)
+            self.files[shard].write(json.dumps(record, ensure_ascii=False))
+            self.files[shard].write('\n')
+        self.bundles.write(json.dumps(result.stats, ensure_ascii=False))
+        self.bundles.write('\n')
+        if result.stats['status'] == 'ok':
+            path = os.path.join(self.directory, 'documents', f"{result.stats['bundle']}.shard")
+            write_shard(path, result.stats['bundle'], Counter(
+                (record['fingerprint'], record['symbol']) for record in result.records
+            ))
+            self.document_shards.append(path)
+
+    def build_index(self) -> CorpusIndex:
+        """The corpus index of the bundles written so far, in `index.sqlite`."""
+        return CorpusIndex.build(self.document_shards, os.path.join(self.directory, 'index.sqlite'))
+
+    def close(self):
+        for f in self.files:
+            f.close()
+        self.bundles.close()
+
+
+def process_corpus(bundles: list[str], out: str, jobs: int = 0, shards: int = SHARDS) -> Iterator[dict]:
+    """Process `bundles` on `jobs` worker processes (0 for all CPUs) into the shards in `out`.
+
+    Yields the counters of each bundle as it is written, in the order of `bundles`, then
+    merges the document shards into the corpus index `index.sqlite`. A few bundles per
+    worker are processed ahead, so finished results do not pile up behind a slow bundle.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    writer = ShardWriter(out, shards)
+    try:
+        for result in _results(bundles, jobs):
+            writer.write(result)
+            yield result.stats
+    finally:
+        writer.close()
+    writer.build_index().close()
+
+
+def _results(bundles: list[str], jobs: int) -> Iterator[BundleResult]:
+    if jobs == 1:
+        yield from map(process_bundle, bundles)
+        return
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker)
+    pending: deque[Future[BundleResult]] = deque()
+    try:
+        for path in bundles:
+            pending.append(executor.submit(process_bundle, path))
+            if len(pending) >= 4 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,192 @@
+"""Symbol statistics of a whole corpus, built map-reduce style from one shard per document.
+
+The map step writes a shard per document: one line per distinct symbol with its count,
+sorted by the symbol's `fingerprint` and rendered LaTeX. The reduce step streams a k-way merge of
+the shards into a SQLite corpus index, holding one line per shard in memory; with more
+shards than `MERGE_FAN_IN`, groups of shards are first merged into intermediate shards.
+The index then answers the most common symbols and the documents using a symbol from its
+B-tree indexes, without loading the corpus.
+"""
+from collections import Counter
+from heapq import merge
+from itertools import groupby
+from typing import Iterable, Iterator, NamedTuple, Optional
+import contextlib
+import json
+import os
+import sqlite3
+import tempfile
+
+# Shards merged at once; more are merged in several passes to bound open files and memory
+MERGE_FAN_IN = 256
+
+SCHEMA = """
+CREATE TABLE documents (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE symbols (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    latex TEXT NOT NULL,
+    occurrences INTEGER NOT NULL,
+    documents INTEGER NOT NULL  -- Number of documents using the symbol
+);
+CREATE TABLE postings (
+    symbol INTEGER NOT NULL REFERENCES symbols(id),
+    document INTEGER NOT NULL REFERENCES documents(id),
+    count INTEGER NOT NULL,
+    PRIMARY KEY (symbol, document)
+) WITHOUT ROWID;
+"""
+# Created once the tables are filled, which is faster than maintaining them while inserting
+INDEXES = """
+CREATE INDEX symbols_occurrences ON symbols(occurrences DESC, latex);
+CREATE INDEX symbols_fingerprint ON symbols(fingerprint);
+CREATE INDEX symbols_latex ON symbols(latex);
+"""
+
+# (fingerprint, latex, document, count), the sort order of shards
+ShardLine = tuple[str, str, str, int]
+
+
+class CorpusSymbol(NamedTuple):
+    latex: str
+    fingerprint: str
+    occurrences: int
+    documents: int
+
+
+def write_shard(path: str, document: str, counts: Counter[tuple[str, str]]):
+    """Write the shard of `document` from the count of each (fingerprint, latex) in it."""
+    tmp_path = f"{path}.{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        for (symbol_fingerprint, latex), count in sorted(counts.items()):
+            f.write(json.dumps([symbol_fingerprint, latex, document, count], ensure_ascii=False))
+            f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def read_shard(path: str) -> Iterator[ShardLine]:
+    with open(path) as f:
+        for line in f:
+            symbol_fingerprint, latex, document, count = json.loads(line)
+            yield symbol_fingerprint, latex, document, count
+
+
+def merge_shards(paths: list[str], fan_in: int = MERGE_FAN_IN) -> Iterator[ShardLine]:
+    """Lines of all the shards at `paths` in sort order, merging at most `fan_in` files at once."""
+    if fan_in < 2:
+        # Merging groups of one shard would never reduce their number
+        raise ValueError(f"fan_in must be at least 2, not {fan_in}")
+    # Checked on the call, not once the lines are first read
+    return _merge_shards(paths, fan_in)
+
+
+def _merge_shards(paths: list[str], fan_in: int) -> Iterator[ShardLine]:
+    with tempfile.TemporaryDirectory(prefix='symbolnav-merge-') as directory:
+        passes = 0
+        while len(paths) > fan_in:
+            # Merge groups of shards into intermediate shards until one pass is left
+            merged = []
+            for group in range(0, len(paths), fan_in):
+                path = os.path.join(directory, f"{passes}-{group // fan_in}.shard")
+                with open(path, 'w') as f:
+                    for line in merge(*map(read_shard, paths[group:group + fan_in])):
+                        f.write(json.dumps(line, ensure_ascii=False))
+                        f.write('\n')
+                merged.append(path)
+            paths, passes = merged, passes + 1
+        yield from merge(*map(read_shard, paths))
+
+
+class CorpusIndex:
+    """Symbols of a corpus with their occurrence and document counts, stored in SQLite."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Opened read-only: the index is only ever written whole, by `build`
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    @classmethod
+    def build(cls, shards: list[str], path: str, fan_in: int = MERGE_FAN_IN) -> 'CorpusIndex':
+        """Merge the document shards at `shards` into a new corpus index at `path`."""
+        lines = merge_shards(shards, fan_in)
+        tmp_path = f"{path}.{os.getpid()}"
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        connection = sqlite3.connect(tmp_path)
+        try:
+            connection.executescript(SCHEMA)
+            with connection:
+                _load(connection, lines)
+            connection.executescript(INDEXES)
+        finally:
+            connection.close()
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
+
+    def document_count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def top(self, k: int = 20) -> list[CorpusSymbol]:
+        """The `k` symbols with the most occurrences across the corpus."""
+        return [CorpusSymbol(*row) for row in self.connection.execute(
+            "SELECT latex, fingerprint, occurrences, documents FROM symbols"
+            " ORDER BY occurrences DESC, latex LIMIT ?", (k,)
+        )]
+
+    def find(self, latex: str) -> Optional[CorpusSymbol]:
+        """The most common symbol rendered as `latex`, if the corpus uses one."""
+        return self._symbol("latex = ? ORDER BY occurrences DESC", latex)
+
+    def get(self, symbol_fingerprint: str) -> Optional[CorpusSymbol]:
+        """The symbol with the hex `fingerprint`, if the corpus uses it."""
+        return self._symbol("fingerprint = ?", symbol_fingerprint)
+
+    def _symbol(self, condition: str, value: str) -> Optional[CorpusSymbol]:
+        row = self.connection.execute(
+            f"SELECT latex, fingerprint, occurrences, documents FROM symbols WHERE {condition} LIMIT 1", (value,)
+        ).fetchone()
+        return CorpusSymbol(*row) if row is not None else None
+
+    def documents(self, symbol_fingerprint: str, k: Optional[int] = None) -> list[tuple[str, int]]:
+        """(document, count) of the documents using the symbol with the hex `fingerprint`, most uses first."""
+        return list(self.connection.execute(
+            "SELECT documents.name, postings.count FROM symbols"
+            " JOIN postings ON postings.symbol = symbols.id"
+            " JOIN documents ON documents.id = postings.document"
+            " WHERE symbols.fingerprint = ?"
+            " ORDER BY postings.count DESC, documents.name LIMIT ?",
+            (symbol_fingerprint, -1 if k is None else k),
+        ))
+
+
+def _load(connection: sqlite3.Connection, lines: Iterable[ShardLine]):
+    # One symbol at a time: its postings are inserted as they are merged, the symbol row
+    # with its totals once the next symbol starts
+    document_ids: dict[str, int] = {}
+    for symbol_id, ((symbol_fingerprint, latex), group) in enumerate(groupby(lines, key=lambda line: line[:2]), 1):
+        occurrences = documents = 0
+        postings = []
+        for _, _, document, count in group:
+            document_id = document_ids.get(document)
+            if document_id is None:
+                document_id = document_ids[document] = len(document_ids) + 1
+                connection.execute("INSERT INTO documents VALUES (?, ?)", (document_id, document))
+            postings.append((symbol_id, document_id, count))
+            occurrences += count
+            documents += 1
+            if len(postings) >= 4096:
+                connection.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+                postings.clear()
+        connection.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+        connection.execute(
+            "INSERT INTO symbols VALUES (?, ?, ?, ?, ?)", (symbol_id, symbol_fingerprint, latex, occurrences, documents)
+        )
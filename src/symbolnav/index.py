@@ -0,0 +1,271 @@
+"""Persistent index of the symbols of a document, their rendered LaTeX and their occurrences.
+
+The index is a SQLite database kept per document. Each file is re-indexed only when its
+content hash changes, so listing symbols or checking one out after the first run reads
+the index instead of lexing, parsing and sorting the whole document again.
+"""
+from typing import NamedTuple, Optional
+import contextlib
+import hashlib
+import io
+import os
+import pickle
+import sqlite3
+import sys
+
+from .cache import cache_dir, grammar_hash
+from .latex_math_extractor import LaTeXMath, analyze_file
+from .renderer import Renderer
+from .symbol_extractor import ASTNode, CachedError, SymbolExtractor, fingerprint, sort_symbols
+from .symbol_extractor import interpreter
+
+# Bump when the layout or the content of the index changes without a grammar change
+INDEX_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,  -- Real path, identifies the file across runs
+    name TEXT NOT NULL,  -- Name as given on the last run, used in messages
+    position INTEGER NOT NULL,  -- Order of the file in the document
+    hash TEXT NOT NULL,
+    lex_output TEXT NOT NULL  -- What lexing the file printed, replayed on every run
+);
+CREATE TABLE IF NOT EXISTS spans (
+    id INTEGER PRIMARY KEY,
+    file INTEGER NOT NULL REFERENCES files(id),
+    seq INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    "column" INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    open_mark TEXT NOT NULL,
+    close_mark TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    "end" INTEGER NOT NULL,
+    error BLOB  -- Pickled CachedError if the math did not parse
+);
+CREATE INDEX IF NOT EXISTS spans_file ON spans(file, seq);
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    fingerprint BLOB UNIQUE NOT NULL,  -- Stable across runs, unlike the pickled node
+    node BLOB NOT NULL,
+    latex TEXT NOT NULL,
+    rank INTEGER NOT NULL  -- Position in `sort_symbols` order, the number used by --checkout
+);
+CREATE INDEX IF NOT EXISTS symbols_rank ON symbols(rank);
+CREATE INDEX IF NOT EXISTS symbols_latex ON symbols(latex);
+CREATE TABLE IF NOT EXISTS occurrences (
+    symbol INTEGER NOT NULL REFERENCES symbols(id),
+    span INTEGER NOT NULL REFERENCES spans(id),
+    PRIMARY KEY (symbol, span)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS occurrences_span ON occurrences(span);
+"""
+
+
+class IndexedSymbol(NamedTuple):
+    rank: int
+    latex: str
+    file: str  # First occurrence
+    line: int
+    column: int
+
+
+class SymbolIndex:
+    """Symbols of a set of files with the math spans they occur in, stored in SQLite.
+
+    `update` brings the index in line with the files, re-indexing those whose content
+    changed; the queries then read from the index only. Without `path` the index lives in
+    memory for the lifetime of the object.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.connection = sqlite3.connect(path if path is not None else ':memory:')
+        self.connection.executescript(SCHEMA)
+        self.sources: dict[str, str] = {}  # Text of each file read by `update`, by real path
+        self._signatures: dict[str, tuple[int, int]] = {}  # (mtime, size) of each file when it was read
+        self._symbol_ids: Optional[dict[bytes, int]] = None  # By fingerprint
+        self._listing: Optional[list[IndexedSymbol]] = None  # `symbols()` until the index changes
+
+    @staticmethod
+    def default_path(root: str, project: bool = False) -> Optional[str]:
+        """Path of the index of the document `root`, or None if caching is disabled."""
+        directory = cache_dir()
+        if directory is None:
+            return None
+        lexer_module = sys.modules[f"{__package__}.latex_math_extractor.lexer"]
+        version = (
+            f"{INDEX_VERSION}_{grammar_hash(lexer_module, 't_')}"
+            f"_{grammar_hash(interpreter, 't_')}_{grammar_hash(interpreter, 'p_')}"
+        )
+        document = f"{os.path.realpath(root)}\n{project}"
+        document_hash = hashlib.blake2b(document.encode(), digest_size=8).hexdigest()
+        return os.path.join(directory, f"index_{version}_{document_hash}.sqlite")
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, files: list[str], symbol_extractor: SymbolExtractor, jobs: int = 1):
+        """Index `files` in this order, re-indexing only the files whose content changed.
+
+        Nothing is printed: lexer output and parse errors are stored and shown by `report`.
+        Files not modified since the previous update of this index are not read again.
+        """
+        previous_sources, self.sources = self.sources, {}
+        self._symbol_ids = None  # Another process may have updated the index since
+        with self.connection:
+            indexed = {
+                path: (file_id, file_hash, (name, position))
+                for file_id, path, file_hash, name, position in self.connection.execute(
+                    "SELECT id, path, hash, name, position FROM files"
+                )
+            }
+            changed = moved = False
+            for position, name in enumerate(files):
+                path = os.path.realpath(name)
+                stat = os.stat(name)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                file_id, indexed_hash, placement = indexed.pop(path, (None, None, None))
+                if file_id is not None and path in previous_sources and self._signatures.get(path) == signature:
+                    text = previous_sources[path]
+                    file_hash = indexed_hash
+                else:
+                    with open(name, 'r') as f:
+                        text = f.read()
+                    self._signatures[path] = signature
+                    file_hash = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+                self.sources[path] = text
+                if file_id is not None and indexed_hash == file_hash:
+                    if placement != (name, position):
+                        self.connection.execute(
+                            "UPDATE files SET name = ?, position = ? WHERE id = ?", (name, position, file_id)
+                        )
+                        moved = True
+                    continue
+                if file_id is not None:
+                    self._remove(file_id)
+                self._add(name, path, position, file_hash, symbol_extractor, jobs)
+                changed = True
+            for file_id, _, _ in indexed.values():
+                self._remove(file_id)
+                changed = True
+            if changed:
+                self._rank()
+            if changed or moved:
+                self._listing = None
+
+    def _add(self, name: str, path: str, position: int, file_hash: str, symbol_extractor: SymbolExtractor, jobs: int):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            spans = analyze_file(name)
+        file_id = self.connection.execute(
+            "INSERT INTO files (path, name, position, hash, lex_output) VALUES (?, ?, ?, ?, ?)",
+            (path, name, position, file_hash, output.getvalue()),
+        ).lastrowid
+        entries = symbol_extractor.extract_entries(
+            [(latex_math.value, name, latex_math.line, latex_math.column) for latex_math in spans], jobs=jobs
+        )
+
+        symbol_ids = self._symbols()
+        next_symbol_id = max(symbol_ids.values(), default=0) + 1
+        next_span_id = self.connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM spans").fetchone()[0]
+        span_rows, symbol_rows, occurrence_rows = [], [], set()
+        for seq, (latex_math, entry) in enumerate(zip(spans, entries)):
+            span_id = next_span_id + seq
+            error = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL) if isinstance(entry, CachedError) else None
+            span_rows.append((
+                span_id, file_id, seq, latex_math.line, latex_math.column, latex_math.type,
+                *latex_math.marks, *latex_math.span, error,
+            ))
+            if error is not None:
+                continue
+            for symbol in entry:
+                key = fingerprint(symbol)
+                symbol_id = symbol_ids.get(key)
+                if symbol_id is None:
+                    symbol_id = symbol_ids[key] = next_symbol_id
+                    next_symbol_id += 1
+                    node = pickle.dumps(symbol, protocol=pickle.HIGHEST_PROTOCOL)
+                    symbol_rows.append((symbol_id, key, node, Renderer.to_latex(symbol), -1))
+                occurrence_rows.add((symbol_id, span_id))
+        self.connection.executemany("INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", span_rows)
+        self.connection.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?)", symbol_rows)
+        self.connection.executemany("INSERT INTO occurrences VALUES (?, ?)", occurrence_rows)
+
+    def _remove(self, file_id: int):
+        self.connection.execute(
+            "DELETE FROM occurrences WHERE span IN (SELECT id FROM spans WHERE file = ?)", (file_id,)
+        )
+        self.connection.execute("DELETE FROM spans WHERE file = ?", (file_id,))
+        self.connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _symbols(self) -> dict[bytes, int]:
+        # Symbols are matched by fingerprint: the pickled bytes of equal nodes may differ
+        # between runs, and the fingerprints need no unpickling
+        if self._symbol_ids is None:
+            self._symbol_ids = dict(self.connection.execute("SELECT fingerprint, id FROM symbols"))
+        return self._symbol_ids
+
+    def _rank(self):
+        self.connection.execute("DELETE FROM symbols WHERE id NOT IN (SELECT symbol FROM occurrences)")
+        self._symbol_ids = None
+        symbol_ids: dict[ASTNode, int] = {
+            pickle.loads(node): symbol_id
+            for symbol_id, node in self.connection.execute("SELECT id, node FROM symbols")
+        }
+        self.connection.executemany(
+            "UPDATE symbols SET rank = ? WHERE id = ?",
+            ((rank, symbol_ids[symbol]) for rank, symbol in enumerate(sort_symbols(symbol_ids))),
+        )
+
+    def report(self, ignore_errors: bool = False):
+        """Print what lexing the files printed, then their parse errors unless `ignore_errors`."""
+        for (lex_output,) in self.connection.execute("SELECT lex_output FROM files ORDER BY position"):
+            print(lex_output, end="")
+        if ignore_errors:
+            return
+        for name, path, line, column, start, end, open_mark, close_mark, error in self.connection.execute(
+            'SELECT f.name, f.path, s.line, s."column", s.start, s."end", s.open_mark, s.close_mark, s.error '
+            "FROM spans s JOIN files f ON s.file = f.id WHERE s.error IS NOT NULL ORDER BY f.position, s.seq"
+        ):
+            latex = self.sources[path][start + len(open_mark):end - len(close_mark)]
+            pickle.loads(error).to_error(latex, name, line, column).display_error()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
+
+    def symbols(self) -> list[IndexedSymbol]:
+        """All symbols in `sort_symbols` order, each with its first occurrence."""
+        if self._listing is not None:
+            return self._listing
+        # SQLite takes the bare columns from the row holding the MIN()
+        rows = self.connection.execute(
+            'SELECT y.rank, y.latex, f.name, s.line, s."column", MIN(f.position * 4294967296 + s.seq) '
+            "FROM symbols y JOIN occurrences o ON o.symbol = y.id JOIN spans s ON o.span = s.id "
+            "JOIN files f ON s.file = f.id GROUP BY y.id ORDER BY y.rank"
+        )
+        self._listing = [IndexedSymbol(*row[:5]) for row in rows]
+        return self._listing
+
+    def find(self, latex: str) -> Optional[int]:
+        """Rank of the symbol rendered as `latex`, or None if no symbol is."""
+        row = self.connection.execute("SELECT MIN(rank) FROM symbols WHERE latex = ?", (latex,)).fetchone()
+        return row[0]
+
+    def latex(self, rank: int) -> str:
+        return self.connection.execute("SELECT latex FROM symbols WHERE rank = ?", (rank,)).fetchone()[0]
+
+    def occurrences(self, rank: int) -> list[tuple[str, LaTeXMath]]:
+        """(file name, span) of each occurrence of the symbol at `rank`, in document order."""
+        rows = self.connection.execute(
+            'SELECT f.name, f.path, s.line, s."column", s.type, s.open_mark, s.close_mark, s.start, s."end" '
+            "FROM symbols y JOIN occurrences o ON o.symbol = y.id JOIN spans s ON o.span = s.id "
+            "JOIN files f ON s.file = f.id WHERE y.rank = ? ORDER BY f.position, s.seq",
+            (rank,),
+        )
+        return [
+            (name, LaTeXMath(
+                self.sources[path], os.path.abspath(name), line, column, type, (open_mark, close_mark), (start, end)
+            ))
+            for name, path, line, column, type, open_mark, close_mark, start, end in rows
+        ]
@@ -1,10 +1,15 @@
 from .exceptions import LaTeXValueError
-from .extractor import LaTeXMath, LaTeXMathExtractor
+from .extractor import LaTeXMath, LaTeXMathExtractor, SpanTable
 from .lexer import lexer
+from .project import analyze_file, analyze_files, resolve_includes
 
 __all__ = [
     "LaTeXValueError", 
     "LaTeXMath", 
     "LaTeXMathExtractor", 
-    "lexer"
+    "SpanTable",
+    "lexer",
+    "analyze_file",
+    "analyze_files",
+    "resolve_includes",
 ]
\ No newline at end of file
@@ -1,89 +1,454 @@
-from typing import Generator, Optional, Tuple
+from array import array
+from typing import Generator, Iterator, Literal, NamedTuple, Optional, Sequence, TextIO, Tuple, cast
 from dataclasses import dataclass
+import hashlib
+import os
+import pickle
+import sys
+import threading
+
+from ply.lex import Lexer
 
 from .exceptions import LaTeXValueError
 from .lexer import lexer
-import os
+from .scanner import MathScanner, MathSpan
+from ..cache import cache_dir, grammar_hash
+from ..line_index import LineIndex
+from .. import runs
+
+# Bump when the spans recorded for a source change without a lexer rule change
+SPAN_TABLE_VERSION = 4
 
 
-@dataclass
+@dataclass(eq=False, slots=True)
 class LaTeXMath:
+    """A math span, stored as offsets into the source it was found in.
+
+    `value` and `contexts` are sliced from the shared source on access, so a record holds
+    no copy of the text.
+    """
+    source: str
     filename: str
     line: int
     column: int
     type: str
-    value: str
-    contexts: Tuple[str, str]
     marks: Tuple[str, str]
+    span: Tuple[int, int]  # Absolute [start, end) of the math in the source, marks included
+
+    @property
+    def value(self) -> str:
+        return self.source[self.span[0] + len(self.marks[0]):self.span[1] - len(self.marks[1])]
+
+    @property
+    def contexts(self) -> Tuple[str, str]:
+        return _contexts(self.source, *self.span)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, LaTeXMath):
+            return NotImplemented
+        return (
+            (self.filename, self.line, self.column, self.type, self.marks, self.span, self.value, self.contexts)
+            == (other.filename, other.line, other.column, other.type, other.marks, other.span, other.value, other.contexts)
+        )
 
     def __repr__(self):
         return f"LaTeXMath(type={self.type}, value={repr(self.value)})"
 
 
+class SpanEdit(NamedTuple):
+    """How `update` built a table from the previous one: the first `head` previous spans are
+    kept, `scanned` spans follow that were lexed again, then the previous spans from `tail` on.
+    Those from `shifted` on only moved by whole lines, the others also got new columns."""
+    head: int
+    scanned: int
+    tail: int
+    shifted: int
+
+
+class SpanTable:
+    """Source text and math spans of one analysis, the baseline of the next incremental run.
+
+    Spans are stored as columns of offsets, positions, types and marks, so an incremental
+    run keeps and moves them with a few slices instead of a record per span. Their offsets
+    and line numbers are shifted lazily, by runs (`(first span, offset shift, line shift)`,
+    see `symbolnav.runs`), so an edit leaves the stored values as they are. `spans` builds
+    the `LaTeXMath` records on first access, `span` a single one.
+    """
+
+    def __init__(
+        self, text: str, spans: Sequence[LaTeXMath] = (), complete: bool = True, file: Optional[str] = None
+    ):
+        self.text = text
+        self.file = file if file is not None else spans[0].filename if spans else "untitled.tex"
+        self.complete = complete  # False if lexing stopped at an error before the end of the text
+        self.line_index: Optional[LineIndex] = None  # Of `text`, updated by the next incremental run
+        self.edit: Optional[SpanEdit] = None  # Set by `update`
+        self._runs: list[runs.Run] = [(0, 0, 0)]
+        self._starts = array('q', [math.span[0] for math in spans])
+        self._ends = array('q', [math.span[1] for math in spans])
+        self._lines = array('q', [math.line for math in spans])
+        self._columns = array('q', [math.column for math in spans])
+        self._types = [math.type for math in spans]
+        self._marks = [math.marks for math in spans]
+        self._spans: Optional[list[LaTeXMath]] = list(spans) if spans else None
+
+    def __getstate__(self) -> dict:
+        # The records and the line index are rebuilt from the columns and the text
+        return {**self.__dict__, 'line_index': None, 'edit': None, '_spans': None}
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    @property
+    def spans(self) -> list[LaTeXMath]:
+        if self._spans is None:
+            text, file = self.text, self.file
+            starts, ends, lines = (
+                runs.positions(self._starts, self._runs, 1),
+                runs.positions(self._ends, self._runs, 1),
+                runs.positions(self._lines, self._runs, 2),
+            )
+            self._spans = [
+                LaTeXMath(text, file, line, column, type, marks, (start, end))
+                for start, end, line, column, type, marks
+                in zip(starts, ends, lines, self._columns, self._types, self._marks)
+            ]
+        return self._spans
+
+    def span(self, index: int) -> LaTeXMath:
+        if self._spans is not None:
+            return self._spans[index]
+        return LaTeXMath(
+            self.text, self.file, self.line(index), self._columns[index], self._types[index], self._marks[index],
+            (self.start(index), self.end(index)),
+        )
+
+    def start(self, index: int) -> int:
+        return self._starts[index] + runs.run_at(self._runs, index)[1]
+
+    def end(self, index: int) -> int:
+        return self._ends[index] + runs.run_at(self._runs, index)[1]
+
+    def line(self, index: int) -> int:
+        return self._lines[index] + runs.run_at(self._runs, index)[2]
+
+    def find(self, offset: int) -> Optional[int]:
+        """Index of the span containing `offset`, marks included."""
+        index = runs.bisect(self._starts, self._runs, 1, offset) - 1
+        if index >= 0 and offset < self.end(index):
+            return index
+        return None
+
+    def _fold(self):
+        # Store the values as they are, once edits at many places left too many runs
+        self._starts, self._ends, self._lines = (
+            runs.positions(self._starts, self._runs, 1),
+            runs.positions(self._ends, self._runs, 1),
+            runs.positions(self._lines, self._runs, 2),
+        )
+        self._runs = [(0, 0, 0)]
+
+    @staticmethod
+    def default_path(file: str) -> Optional[str]:
+        """Path of the persistent span table of `file`, or None if caching is disabled."""
+        directory = cache_dir()
+        if directory is None:
+            return None
+        lexer_module = sys.modules[f"{__package__}.lexer"]
+        file_hash = hashlib.blake2b(os.path.abspath(file).encode(), digest_size=8).hexdigest()
+        version = f"{SPAN_TABLE_VERSION}_{grammar_hash(lexer_module, 't_')}"
+        return os.path.join(directory, f"spans_{version}_{file_hash}.pickle")
+
+    @classmethod
+    def load(cls, path: str) -> Optional['SpanTable']:
+        try:
+            with open(path, 'rb') as f:
+                table = pickle.load(f)
+        except Exception:
+            return None  # Missing or unreadable table, the next run is a full one
+        return table if isinstance(table, cls) else None
+
+    def save(self, path: str):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def _common_prefix_length(a: str, b: str, block: int = 4096) -> int:
+    limit = min(len(a), len(b))
+    pos = 0
+    # Compare whole blocks first, then locate the first difference inside the block
+    while pos < limit:
+        size = min(block, limit - pos)
+        if a[pos:pos + size] != b[pos:pos + size]:
+            break
+        pos += size
+    while pos < limit and a[pos] == b[pos]:
+        pos += 1
+    return pos
+
+
+def _common_suffix_length(a: str, b: str, limit: int, block: int = 4096) -> int:
+    length = 0
+    while length < limit:
+        size = min(block, limit - length)
+        if a[len(a) - length - size:len(a) - length] != b[len(b) - length - size:len(b) - length]:
+            break
+        length += size
+    while length < limit and a[len(a) - length - 1] == b[len(b) - length - 1]:
+        length += 1
+    return length
+
+
+def _context_start(source: str, mark_start_pos: int, width: int = 50) -> int:
+    # The last space or newline at least `width` characters before the span, included in the context
+    if mark_start_pos <= width:
+        return 0
+    return max(
+        source.rfind(' ', 0, mark_start_pos - width + 1),
+        source.rfind('\n', 0, mark_start_pos - width + 1),
+        0,
+    )
+
+
+def _context_end(source: str, mark_end_pos: int, width: int = 50) -> int:
+    # The first space or newline at least `width` characters after the span, excluded from the context
+    if mark_end_pos + width >= len(source):
+        return len(source)
+    space = source.find(' ', mark_end_pos + width)
+    # The newline is only searched up to the space, so neither search scans the whole source
+    newline = source.find('\n', mark_end_pos + width, space if space != -1 else len(source))
+    return min(pos for pos in (space, newline, len(source)) if pos != -1)
+
+
+def _contexts(source: str, mark_start_pos: int, mark_end_pos: int) -> Tuple[str, str]:
+    """Text around a span: at least 50 characters on each side, extended to the next space or newline."""
+    return (
+        source[_context_start(source, mark_start_pos):mark_start_pos],
+        source[mark_end_pos:_context_end(source, mark_end_pos)],
+    )
+
+
+def _make_math(
+    source: str, line_index: LineIndex, file: str,
+    type: str, marks: Tuple[str, str], span: Tuple[int, int]
+) -> LaTeXMath:
+    line, column = line_index.position(span[0])
+    return LaTeXMath(source, file, line, column, type, marks, span)
+
+
 class LaTeXMathExtractor:
+    """Finds the math spans of a LaTeX source.
 
-    def __init__(self):
-        self.lexer = lexer
-    
-    def analyze(self, latex: Optional[str] = None, file: Optional[str] = None) -> Generator[LaTeXMath]:
-        assert (latex is not None) ^ (file is not None), "Either latex or file must be provided"
+    `engine` selects how the source is scanned: "scan" (default) jumps between math
+    delimiters with the compiled rules of the lexer, "ply" runs the PLY lexer over
+    every token. Both give the same spans and errors.
+
+    Each analysis lexes with its own clone of the lexer, so threads can share an extractor;
+    `lexer` and `error` are those of the last analysis of the calling thread.
+    """
+
+    def __init__(self, engine: Literal['scan', 'ply'] = 'scan'):
+        assert engine in ('scan', 'ply'), f"Unknown engine {engine}"
+        self.engine = engine
+        self.scanner = MathScanner(lexer) if engine == 'scan' else None
+        self.out: Optional[TextIO] = None  # Where lexing errors are printed, stdout if None
+        self._local = threading.local()
+
+    @property
+    def lexer(self) -> Lexer:
+        """The lexer of the calling thread's last analysis, holding its source and line index."""
+        if getattr(self._local, 'lexer', None) is None:
+            self._local.lexer = lexer.clone()
+        return self._local.lexer
+
+    @property
+    def error(self) -> Optional[LaTeXValueError]:
+        """The lexing error of the calling thread's last analysis, if any."""
+        return getattr(self._local, 'error', None)
+
+    @error.setter
+    def error(self, error: Optional[LaTeXValueError]):
+        self._local.error = error
+
+    @staticmethod
+    def _read(latex: Optional[str], file: Optional[str]) -> Tuple[str, str]:
+        # With both, `latex` is the already read content of `file`
+        assert latex is not None or file is not None, "Either latex or file must be provided"
         if file is not None:
-            with open(file, 'r') as f:
-                latex = f.read()
+            if latex is None:
+                with open(file, 'r') as f:
+                    latex = f.read()
             file = os.path.abspath(file)
         else:
             file = "untitled.tex"
+        return cast(str, latex), file
+    
+    def analyze(self, latex: Optional[str] = None, file: Optional[str] = None) -> Generator[LaTeXMath]:
+        latex, file = self._read(latex, file)
+        yield from self._scan(latex, file, 0)
 
-        self.lexer.input(latex)
+    def _lex(self, lexer: Lexer) -> Iterator[MathSpan]:
         while True:
-            try:
-                tok = self.lexer.token()
-            except LaTeXValueError as e:
-                print(e.cursor)
-                print(e)
-                lexpos = getattr(e.token, 'lexpos', 0)
-                print(self.lexer.lexdata[lexpos-10: lexpos], end="")
-                print(f"<error>{self.lexer.lexdata[lexpos]}</error>", end="")
-                print(self.lexer.lexdata[lexpos+1: lexpos+10], end="")
-                break
+            tok = lexer.token()
             if tok is None:
-                break
-            if tok.type == 'COMMENT':
-                continue
+                return
             if tok.type.startswith('MATH_'):
-                context_span = 0
-                while (
-                    tok.mark_start_pos - context_span > 0 
-                    and (
-                        context_span < 50
-                        or tok.lexer.lexdata[tok.mark_start_pos - context_span] not in (' ', '\n')
-                    )
-                ):
-                    context_span += 1
-                context_beg = tok.mark_start_pos - context_span
-                context_span = 0
-                while (
-                    tok.mark_end_pos + context_span < len(tok.lexer.lexdata)
-                    and (
-                        context_span < 50
-                        or tok.lexer.lexdata[tok.mark_end_pos + context_span] not in (' ', '\n')
-                    )
-                ):
-                    context_span += 1
-                context_end = tok.mark_end_pos + context_span
-                latex_math = LaTeXMath(
-                    filename=file,
-                    line=tok.lineno,
-                    column=tok.column,
-                    type=tok.type,
-                    value=tok.value,
-                    marks=tok.marks,
-                    contexts=(
-                        tok.lexer.lexdata[context_beg: tok.mark_start_pos],
-                        tok.lexer.lexdata[tok.mark_end_pos: context_end]
-                    )
+                yield MathSpan(tok.type, tok.marks, tok.mark_start_pos, tok.mark_end_pos)
+
+    def _scan(
+        self, latex: str, file: str, pos: int, line_index: Optional[LineIndex] = None
+    ) -> Iterator[LaTeXMath]:
+        """Scan `latex` from `pos`, which must be 0 or the end of a math span, in the INITIAL state.
+
+        `line_index`, if given, is the index of `latex` the lexer uses instead of building one.
+        """
+        self.error = None
+        scan_lexer = self._local.lexer = lexer.clone()
+        scan_lexer.input(latex)
+        scan_lexer.lexpos = pos
+        scan_lexer.begin('INITIAL')
+        if line_index is not None:
+            scan_lexer.line_index = line_index
+        line_index = LineIndex.of(scan_lexer)
+        spans = self.scanner.scan(latex, pos) if self.scanner is not None else self._lex(scan_lexer)
+        try:
+            for span in spans:
+                yield _make_math(
+                    latex, line_index, file, span.type, span.marks, (span.mark_start_pos, span.mark_end_pos)
                 )
-                yield latex_math
+        except LaTeXValueError as e:
+            self._report(e, latex)
+
+    def _report(self, e: LaTeXValueError, lexdata: str, offset: int = 0):
+        """Print a lexing error, `offset` being the position of `lexdata` in the whole source."""
+        self.error = e
+        lexpos = getattr(e.token, 'lexpos', 0)
+        if offset:
+            e.token.lexpos = lexpos + offset
+            e.cursor = " " * e.token.lexpos + "^"
+        print(e.cursor, file=self.out)
+        print(e, file=self.out)
+        print(lexdata[lexpos-10: lexpos], end="", file=self.out)
+        print(f"<error>{lexdata[lexpos]}</error>", end="", file=self.out)
+        print(lexdata[lexpos+1: lexpos+10], end="", file=self.out)
+
+    def stream(self, file: str, chunk_size: int = 1 << 20) -> Iterator[LaTeXMath]:
+        """Math spans of `file`, reading it `chunk_size` characters at a time.
+
+        Between reads only the text from the line of the last span's context onwards is kept,
+        so memory is bounded by the chunk size rather than the file size. A span is emitted
+        once the text after it can no longer change it or its context; an error or an open
+        span within the context width of the end of the text read so far is retried with the
+        next chunk, and any other error ends the scan. Spans and errors are the same as
+        `analyze`, except that each record's `span` is relative to its `source`, the part of
+        the file read at that point.
+        """
+        scanner = self.scanner if self.scanner is not None else MathScanner(self.lexer)
+        name = os.path.abspath(file)
+        self.error = None
+        # `buffer` always starts at the beginning of the file or at a newline
+        buffer, pos, offset, lines_before, final = '', 0, 0, 0, False
+        with open(file, 'r') as f:
+            while not final:
+                chunk = f.read(chunk_size)
+                final = not chunk
+                buffer += chunk
+                line_index = LineIndex(buffer)
+                try:
+                    for span in scanner.scan(buffer, pos):
+                        start, end = span.mark_start_pos, span.mark_end_pos
+                        if not final and _context_end(buffer, end) == len(buffer):
+                            break
+                        line, column = line_index.position(start)
+                        yield LaTeXMath(buffer, name, lines_before + line, column, span.type, span.marks, (start, end))
+                        pos = end
+                except LaTeXValueError as e:
+                    # Only an error the next chunk could still change is retried: any other
+                    # stops the scan, and retrying it would keep the whole rest of the file
+                    if final or _context_end(buffer, getattr(e.token, 'lexpos', 0)) < len(buffer):
+                        self._report(e, buffer, offset)
+                        return
+                keep = max(buffer.rfind('\n', 0, min(_context_start(buffer, pos), pos) + 1), 0)
+                lines_before += buffer.count('\n', 0, keep)
+                offset += keep
+                buffer, pos = buffer[keep:], pos - keep
+
+    def update(
+        self, previous: Optional[SpanTable], latex: Optional[str] = None, file: Optional[str] = None
+    ) -> SpanTable:
+        """Analyze the new source incrementally against the span table of the previous run.
+
+        Spans ending before the first change are kept as they are. Lexing restarts at the
+        end of the last of them and stops as soon as it ends a span inside the unchanged
+        tail of the source at the end of a previous span: from there on lexing would repeat
+        the previous run, so the remaining spans are reused at their shifted positions.
+        The result is identical to a full `analyze`, and its `edit` tells which spans were
+        kept, lexed again and reused.
+        """
+        latex, file = self._read(latex, file)
+        if previous is None:
+            spans = list(self._scan(latex, file, 0))
+            table = SpanTable(latex, spans, complete=self.error is None, file=file)
+            table.line_index = LineIndex.of(self.lexer)
+            table.edit = SpanEdit(0, len(spans), 0, 0)
+            return table
+
+        old_text = previous.text
+        prefix = _common_prefix_length(old_text, latex)
+        suffix = _common_suffix_length(old_text, latex, min(len(old_text), len(latex)) - prefix)
+        delta = len(latex) - len(old_text)
+        tail_start = len(old_text) - suffix
+        if previous.line_index is not None:
+            line_index = previous.line_index.replace(latex, prefix, tail_start, tail_start + delta)
+        else:
+            line_index = LineIndex(latex)
+
+        head = runs.bisect(previous._ends, previous._runs, 1, prefix)
+        resume = previous.end(head - 1) if head else 0
+        scanned, tail = [], len(previous)
+        for latex_math in self._scan(latex, file, resume, line_index):
+            scanned.append(latex_math)
+            # Lexing resynchronizes at the end of a previous span inside the unchanged tail
+            old_end = latex_math.span[1] - delta
+            if previous.complete and old_end >= tail_start:
+                index = runs.bisect(previous._ends, previous._runs, 1, old_end) - 1
+                if index >= head and previous.end(index) == old_end:
+                    tail = index + 1
+                    break
+
+        # Spans on the line where the unchanged tail starts get new columns
+        shifted = tail
+        while shifted < len(previous) and previous.start(shifted) - previous._columns[shifted] < tail_start:
+            shifted += 1
+        moved = [
+            _make_math(
+                latex, line_index, file, previous._types[index], previous._marks[index],
+                (previous.start(index) + delta, previous.end(index) + delta),
+            )
+            for index in range(tail, shifted)
+        ]
+
+        # Kept spans need no change, contexts are sliced from the source on access. The
+        # spans after the new ones keep their stored values, their runs are shifted
+        table = SpanTable(latex, scanned + moved, complete=self.error is None, file=file)
+        line_shift = latex.count('\n', prefix, tail_start + delta) - old_text.count('\n', prefix, tail_start)
+        for name in ('_starts', '_ends', '_lines', '_columns', '_types', '_marks'):
+            setattr(table, name, getattr(previous, name)[:head] + getattr(table, name) + getattr(previous, name)[shifted:])
+        table._runs = runs.splice(
+            previous._runs, len(previous), head, len(scanned) + len(moved), shifted, (delta, line_shift)
+        )
+        if len(table._runs) > runs.MAX_RUNS:
+            table._fold()
+        table._spans = None
+        table.line_index = line_index
+        table.edit = SpanEdit(head, len(scanned), tail, shifted)
+        return table
 
 if __name__ == '__main__':
     from rich.console import Console
@@ -1,5 +1,7 @@
-import ply.lex as lex
+import sys
 from .exceptions import LaTeXValueError
+from ..cache import build_lexer
+from ..line_index import LineIndex
 
 # ========================================================
 # User configurable variables
@@ -67,15 +69,14 @@ states = tuple(
 
 def _get_line_number(lexer, pos):
     assert 0 <= pos < len(lexer.lexdata), "Invalid position"
-    return lexer.lexdata[:pos].count('\n') + 1   # Return 1-based line number
+    return LineIndex.of(lexer).line_number(pos)   # Return 1-based line number
 
 
 def _get_line_start_pos(lexer, pos):
     """Calculate the absolute position (0-based index) of the start of the line containing pos."""
     assert 0 <= pos < len(lexer.lexdata), "Invalid position"
-    # rfind returns 0-based index of newline, or -1 if not found
-    # Adding 1 gives us the position after the newline (start of line), or 0 for first line
-    return lexer.lexdata.rfind('\n', 0, pos) + 1  # Returns 0-based position
+    # The line index is built once per input, so this is a binary search instead of an rfind
+    return LineIndex.of(lexer).line_start(pos)  # Returns 0-based position
 
 
 def _make_begin_handler(state_name, begin_pattern, token_type):
@@ -167,4 +168,4 @@ for token_type, config in MATH_MODES.items():
 def t_error(t):
     raise LaTeXValueError(f"Unexpected token", t)
 
-lexer = lex.lex()
+lexer = build_lexer(sys.modules[__name__])
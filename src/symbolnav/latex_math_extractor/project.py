@@ -0,0 +1,114 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Mapping, Optional
+import contextlib
+import io
+import os
+import re
+import sys
+
+from .extractor import LaTeXMath, LaTeXMathExtractor, SpanTable
+
+INCLUDE_PATTERN = re.compile(r'\\(input|include|subfile)[ ]*\{[ ]*([^{}]+?)[ ]*\}')
+# `%` starts a comment unless escaped, i.e. after an even number of backslashes (`\\\\%` is one)
+COMMENT_PATTERN = re.compile(r'(?<!\\)((?:\\\\)*)%.*')
+
+
+def strip_comments(latex: str) -> str:
+    """`latex` without its comments, keeping the backslashes before each `%`."""
+    return COMMENT_PATTERN.sub(r'\1', latex)
+
+
+def _find_include(
+    name: str, command: str, including_dir: str, root_dir: str, exists: Callable[[str], bool] = os.path.isfile
+) -> Optional[str]:
+    # `\include` always appends .tex, `\input` and `\subfile` only when the name has no extension.
+    # Paths are relative to the main file; `\subfile` paths also to the including file.
+    names = [name + '.tex'] if command == 'include' or not os.path.splitext(name)[1] else [name]
+    directories = [including_dir, root_dir] if command == 'subfile' else [root_dir, including_dir]
+    for directory in directories:
+        for candidate in names:
+            path = os.path.normpath(os.path.join(directory, candidate))
+            if exists(path):
+                return path
+    return None
+
+
+def resolve_includes(root: str, sources: Optional[Mapping[str, str]] = None) -> list[str]:
+    """Files of the project rooted at `root`, in document order, each listed once.
+
+    Follows `\\input`, `\\include` and `\\subfile` outside comments. Paths are returned
+    relative to the directory of `root` as given; missing files are skipped with a warning.
+    With `sources`, the files are looked up there by normalized path instead of on disk.
+    """
+    root_dir = os.path.dirname(root)
+    files: list[str] = []
+    seen: set[str] = set()
+    exists = os.path.isfile if sources is None else sources.__contains__
+
+    def visit(file: str):
+        real_path = os.path.realpath(file) if sources is None else file
+        if real_path in seen:
+            return
+        seen.add(real_path)
+        files.append(file)
+        if sources is None:
+            with open(file, 'r') as f:
+                latex = f.read()
+        else:
+            latex = sources[file]
+        latex = strip_comments(latex)
+        for match in INCLUDE_PATTERN.finditer(latex):
+            command, name = match.groups()
+            path = _find_include(name, command, os.path.dirname(file), root_dir, exists)
+            if path is None:
+                print(f"Warning: cannot find \\{command}{{{name}}} included from {file}", file=sys.stderr)
+                continue
+            visit(path)
+
+    visit(root)
+    return files
+
+
+def analyze_file(file: str, extractor: Optional[LaTeXMathExtractor] = None) -> list[LaTeXMath]:
+    """Math spans of `file`, lexing only what changed since the span table of the previous run."""
+    extractor = extractor or LaTeXMathExtractor()
+    span_path = SpanTable.default_path(file)
+    span_table = extractor.update(SpanTable.load(span_path) if span_path is not None else None, file=file)
+    if span_path is not None:
+        span_table.save(span_path)
+    return span_table.spans
+
+
+def _analyze_file_quietly(file: str) -> tuple[list[LaTeXMath], str]:
+    # Lexer errors are printed by the parent in file order, not interleaved across workers
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        spans = analyze_file(file)
+    return spans, output.getvalue()
+
+
+def _analyze_file_in_thread(file: str) -> tuple[list[LaTeXMath], str]:
+    # Threads share stdout, so each extractor prints its errors to its own buffer
+    extractor = LaTeXMathExtractor()
+    extractor.out = io.StringIO()
+    return analyze_file(file, extractor), extractor.out.getvalue()
+
+
+def analyze_files(files: list[str], jobs: int = 1, threads: bool = False) -> list[list[LaTeXMath]]:
+    """Math spans of each file, lexing the files on `jobs` worker processes (0 for all CPUs).
+
+    With `threads`, the workers are threads, which run in parallel on free-threaded Python.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(files) == 1:
+        return [analyze_file(file) for file in files]
+    results = []
+    workers = min(jobs, len(files))
+    if threads:
+        executor, analyze = ThreadPoolExecutor(max_workers=workers), _analyze_file_in_thread
+    else:
+        executor, analyze = ProcessPoolExecutor(max_workers=workers), _analyze_file_quietly
+    with executor:
+        for spans, output in executor.map(analyze, files):
+            print(output, end="")
+            results.append(spans)
+    return results
@@ -0,0 +1,104 @@
+import re
+from typing import Iterator, NamedTuple
+
+from ply.lex import Lexer, LexToken
+
+from .exceptions import LaTeXValueError
+from .lexer import MATH_MODES
+
+
+class MathSpan(NamedTuple):
+    type: str
+    marks: tuple[str, str]
+    mark_start_pos: int
+    mark_end_pos: int
+
+
+def _rules(lexer: Lexer, state: str) -> list[tuple[str, str]]:
+    # Rule names and regexes of `state`, in the order PLY tries them
+    rules = []
+    for _, findex in lexer.lexstatere[state]:
+        for entry in findex:
+            if entry is not None and entry[0] is not None:
+                rules.append((entry[0].__name__, entry[0].__doc__))
+    return rules
+
+
+def _compile_state(lexer: Lexer, state: str, switches: dict[str, str]) -> re.Pattern:
+    """Regex skipping every token of `state` that does not switch state, then matching the switch.
+
+    The switch is captured in a group named after its token type; when no group matched,
+    skipping stopped at the end of the text or where no rule matches.
+    """
+    ignore = ''.join(re.escape(c) for c in lexer.lexstateignore.get(state, ''))
+    skip, switch, before = [], [], []
+    for name, regex in _rules(lexer, state):
+        if name in switches:
+            switch.append(f"(?P<{switches[name]}>{regex})")
+            before.append(regex)
+        elif before:
+            # PLY picks the first rule that matches, so a token is skipped only when no
+            # state-switching rule listed before its own rule matches there
+            skip.append(f"(?!{'|'.join(before)})(?:{regex})")
+        else:
+            skip.append(f"(?:{regex})")
+    if ignore:
+        skip.insert(0, f"[{ignore}]")
+    return re.compile(f"(?:{'|'.join(skip)})*(?:{'|'.join(switch)})?", lexer.lexreflags)
+
+
+class MathScanner:
+    """Finds math spans by jumping between delimiters instead of producing a token for all text.
+
+    Built from the compiled rules of the document lexer, so it follows `MATH_MODES` and
+    PLY's rule order: each state compiles into a single regex that skips every token which
+    does not begin or end math and then matches the delimiter. Spans and errors are the
+    same as with the PLY lexer.
+    """
+
+    def __init__(self, lexer: Lexer):
+        self.lexer = lexer
+        states = {token_type: config['state'] for token_type, config in MATH_MODES.items()}
+        self.initial = _compile_state(
+            lexer, 'INITIAL', {f"t_BEGIN_{token_type}": token_type for token_type in MATH_MODES}
+        )
+        self.modes = {
+            token_type: _compile_state(lexer, state, {f"t_{state}_END_{token_type}": token_type})
+            for token_type, state in states.items()
+        }
+
+    def _error(self, lexdata: str, pos: int) -> LaTeXValueError:
+        # Same token and message as the error rules of the lexer raise
+        tok = LexToken()
+        tok.value = lexdata[pos:]
+        tok.lineno = self.lexer.lineno
+        tok.type = 'error'
+        tok.lexer = self.lexer
+        tok.lexpos = pos
+        return LaTeXValueError(f"Unexpected token", tok)
+
+    def scan(self, lexdata: str, pos: int = 0) -> Iterator[MathSpan]:
+        """Math spans of `lexdata` from `pos`, which must be 0 or the end of a span.
+
+        Raises LaTeXValueError where the PLY lexer would. A span left open at the end of
+        the text is dropped, as the PLY lexer stops without emitting it.
+        """
+        initial, modes, length = self.initial, self.modes, len(lexdata)
+        shared_marks: dict[tuple[str, str], tuple[str, str]] = {}
+        while True:
+            begin = initial.match(lexdata, pos)
+            token_type = begin.lastgroup
+            if token_type is None:
+                if begin.end() >= length:
+                    return
+                raise self._error(lexdata, begin.end())
+            end = modes[token_type].match(lexdata, begin.end())
+            if end.lastgroup is None:
+                if end.end() >= length:
+                    return
+                raise self._error(lexdata, end.end())
+            marks = (begin.group(token_type), end.group(token_type))
+            # Spans share one tuple per distinct pair of delimiters
+            marks = shared_marks.setdefault(marks, marks)
+            yield MathSpan(token_type, marks, begin.start(token_type), end.end())
+            pos = end.end()
@@ -0,0 +1,73 @@
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Optional, Tuple
+
+from . import runs
+
+
+class LineIndex:
+    """Newline-offset table over a source string, built once per input.
+
+    Resolves absolute positions (0-based) to 1-based line/column numbers by
+    binary search over the line start offsets, so each lookup is O(log n).
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._starts = array('q', accumulate(
+            (len(line) + 1 for line in text.split('\n')[:-1]), initial=0
+        ))
+        # Line starts after edits are shifted lazily, by runs `(first line, shift)`; None
+        # while they are stored as they are
+        self._runs: Optional[list[runs.Run]] = None
+
+    def replace(self, text: str, start: int, end: int, new_end: int) -> 'LineIndex':
+        """Index of `text`, this index's text with [start, end) replaced by `text[start:new_end]`.
+
+        Only the replaced lines are split again, the runs of the line starts after them
+        are shifted.
+        """
+        first, last = self.line_number(start), self.line_number(end)
+        new_starts = array('q', accumulate(
+            (len(line) + 1 for line in text[start:new_end].split('\n')[:-1]), initial=start
+        ))[1:]
+        index = LineIndex.__new__(LineIndex)
+        index.text = text
+        index._starts = self._starts[:first] + new_starts + self._starts[last:]
+        index._runs = runs.splice(self._runs or [(0, 0)], len(self), first, len(new_starts), last, (new_end - end,))
+        if len(index._runs) > runs.MAX_RUNS:
+            index._starts = runs.positions(index._starts, index._runs, 1)
+        if len(index._runs) > runs.MAX_RUNS or index._runs == [(0, 0)]:
+            index._runs = None
+        return index
+
+    @classmethod
+    def of(cls, lexer) -> 'LineIndex':
+        """Return the index for `lexer.lexdata`, (re)building it when the input changed."""
+        line_index = getattr(lexer, 'line_index', None)
+        if line_index is None or line_index.text is not lexer.lexdata:
+            line_index = cls(lexer.lexdata)
+            lexer.line_index = line_index
+        return line_index
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def line_number(self, pos: int) -> int:
+        if self._runs is not None:
+            return runs.bisect(self._starts, self._runs, 1, pos)
+        return bisect_right(self._starts, pos)  # Return 1-based line number
+
+    def line_offset(self, line: int) -> int:
+        """0-based position of the start of the 1-based `line`."""
+        if self._runs is not None:
+            return self._starts[line - 1] + runs.run_at(self._runs, line - 1)[1]
+        return self._starts[line - 1]
+
+    def line_start(self, pos: int) -> int:
+        return self.line_offset(self.line_number(pos))  # Return 0-based position
+
+    def position(self, pos: int) -> Tuple[int, int]:
+        line = self.line_number(pos)
+        return line, pos - self.line_offset(line) + 1  # Return 1-based (line, column)
@@ -0,0 +1,372 @@
+"""Language Server Protocol server for LaTeX documents, over stdio.
+
+Hover on a symbol lists where it appears, go-to-definition jumps to its first occurrence,
+find-references lists every occurrence, and math that does not parse is reported as a
+diagnostic. Edits are applied incrementally: the span table is updated with
+`LaTeXMathExtractor.update`, and only math whose text changed is parsed again.
+"""
+from bisect import bisect_left
+from typing import BinaryIO, Optional, cast
+from urllib.parse import unquote, urlparse
+import contextlib
+import json
+import os
+import re
+import traceback
+
+from .latex_math_extractor import LaTeXMath, LaTeXMathExtractor, SpanTable
+from .line_index import LineIndex
+from .renderer import Renderer
+from .symbol_extractor import ASTNode, CachedError, ParseCache, SymbolExtractor
+from .symbol_extractor.parse_cache import CacheEntry
+
+# A symbol with the commands decorating it and its scripts, e.g. `\bm p^l_t` or `\tilde{x}_{t-1}`
+SYMBOL_PATTERN = re.compile(
+    r"(?:\\[A-Za-z]+\s*(?=[\\{A-Za-z]))*"
+    r"(?:\{[^{}]*\}|\\[A-Za-z]+|[A-Za-z])"
+    r"(?:\s*[_^]\s*(?:\{(?:[^{}]|\{[^{}]*\})*\}|\\[A-Za-z]+|[^\s{}]))*"
+)
+HOVER_OCCURRENCES = 20  # Occurrences listed in a hover, the rest are counted
+
+# LSP constants
+SYNC_INCREMENTAL = 2
+SEVERITY_ERROR = 1
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+
+def read_message(stream: BinaryIO) -> Optional[dict]:
+    """Read one JSON-RPC message framed by a Content-Length header, None at the end of the stream."""
+    length = None
+    while True:
+        header = stream.readline()
+        if not header:
+            return None
+        header = header.strip()
+        if not header:
+            break
+        name, _, value = header.decode('ascii').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    assert length is not None, "Message without Content-Length"
+    return json.loads(stream.read(length))
+
+
+def write_message(stream: BinaryIO, message: dict):
+    body = json.dumps(message, ensure_ascii=False).encode()
+    stream.write(f"Content-Length: {len(body)}\r\n\r\n".encode('ascii') + body)
+    stream.flush()
+
+
+def _utf16_length(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode('utf-16-le')) // 2
+
+
+def _code_points(line: str, character: int) -> int:
+    # LSP columns count UTF-16 code units, Python strings count code points
+    if line.isascii():
+        return min(character, len(line))
+    units = 0
+    for index, c in enumerate(line):
+        if units >= character:
+            return index
+        units += 2 if ord(c) > 0xFFFF else 1
+    return len(line)
+
+
+def _shift_lines(diagnostic: dict, lines: int) -> dict:
+    start, end = diagnostic['range']['start'], diagnostic['range']['end']
+    return {**diagnostic, 'range': {
+        'start': {**start, 'line': start['line'] + lines},
+        'end': {**end, 'line': end['line'] + lines},
+    }}
+
+
+class Document:
+    """An open document: its text, its span table and the parse result of each span."""
+
+    def __init__(self, uri: str, text: str, version: int):
+        self.uri = uri
+        self.path = unquote(urlparse(uri).path) if uri.startswith('file:') else uri
+        self.version = version
+        self.text = text
+        self.table: Optional[SpanTable] = None
+        self.entries: list[Optional[CacheEntry]] = []  # Parse result of each span, None if parsing crashed
+        self.span_diagnostics: list[tuple[int, dict]] = []  # (span index, diagnostic) of math that does not parse
+        self.lex_error: Optional[tuple[int, str]] = None  # Position and message of a lexing error
+        self._line_index: Optional[LineIndex] = None
+
+    @property
+    def line_index(self) -> LineIndex:
+        if self._line_index is None or self._line_index.text is not self.text:
+            self._line_index = LineIndex(self.text)
+        return self._line_index
+
+    def offset(self, position: dict) -> int:
+        """Offset in the text of an LSP position."""
+        line = position['line']
+        if line >= len(self.line_index):
+            return len(self.text)
+        start = self.line_index.line_offset(line + 1)
+        end = self.text.find('\n', start)
+        line_text = self.text[start:end if end != -1 else len(self.text)]
+        return start + _code_points(line_text, position['character'])
+
+    def position(self, offset: int) -> dict:
+        """LSP position of an offset in the text."""
+        line, column = self.line_index.position(offset)
+        line_start = self.line_index.line_offset(line)
+        return {'line': line - 1, 'character': _utf16_length(self.text[line_start:line_start + column - 1])}
+
+    def range(self, start: int, end: int) -> dict:
+        return {'start': self.position(start), 'end': self.position(end)}
+
+    def apply(self, change: dict):
+        """Apply a `contentChanges` entry to the text."""
+        if 'range' not in change:
+            self.text = change['text']
+        else:
+            start, end = self.offset(change['range']['start']), self.offset(change['range']['end'])
+            self.text = self.text[:start] + change['text'] + self.text[end:]
+
+    def span_at(self, offset: int) -> Optional[int]:
+        """Index of the span containing `offset`, marks included."""
+        return self.table.find(offset) if self.table is not None else None
+
+    def occurrences(self, symbol: ASTNode) -> list[LaTeXMath]:
+        assert self.table is not None
+        return [
+            self.table.span(index) for index, entry in enumerate(self.entries)
+            if entry is not None and not isinstance(entry, CachedError) and symbol in entry
+        ]
+
+
+class LanguageServer:
+    """Serves one client over a pair of byte streams, usually stdin and stdout."""
+
+    def __init__(self, reader: BinaryIO, writer: BinaryIO):
+        self.reader = reader
+        self.writer = writer
+        self.extractor = LaTeXMathExtractor()
+        self.symbol_extractor = SymbolExtractor(cache=ParseCache(maxsize=1 << 16))
+        self.documents: dict[str, Document] = {}
+        self.shutdown_requested = False
+        self.handlers = {
+            'initialize': self.initialize,
+            'shutdown': self.shutdown,
+            'textDocument/didOpen': self.did_open,
+            'textDocument/didChange': self.did_change,
+            'textDocument/didClose': self.did_close,
+            'textDocument/hover': self.hover,
+            'textDocument/definition': self.definition,
+            'textDocument/references': self.references,
+        }
+
+    def serve(self) -> int:
+        """Handle messages until `exit`; returns the exit code the protocol asks for."""
+        # Lexing errors are printed, here they are diagnostics and stdout carries the protocol
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            while True:
+                message = read_message(self.reader)
+                if message is None or message.get('method') == 'exit':
+                    return 0 if self.shutdown_requested else 1
+                self.handle(message)
+
+    def handle(self, message: dict):
+        handler = self.handlers.get(message.get('method', ''))
+        if 'id' not in message:
+            # Notifications get no response, unknown ones are ignored
+            if handler is not None:
+                try:
+                    handler(message.get('params', {}))
+                except Exception:
+                    traceback.print_exc()
+            return
+        if handler is None:
+            error = {'code': METHOD_NOT_FOUND, 'message': f"Unknown method {message.get('method')}"}
+            write_message(self.writer, {'jsonrpc': '2.0', 'id': message['id'], 'error': error})
+            return
+        try:
+            result = handler(message.get('params', {}))
+        except Exception as e:
+            traceback.print_exc()
+            error = {'code': INTERNAL_ERROR, 'message': str(e)}
+            write_message(self.writer, {'jsonrpc': '2.0', 'id': message['id'], 'error': error})
+            return
+        write_message(self.writer, {'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+
+    def initialize(self, params: dict) -> dict:
+        return {
+            'capabilities': {
+                'textDocumentSync': {'openClose': True, 'change': SYNC_INCREMENTAL},
+                'hoverProvider': True,
+                'definitionProvider': True,
+                'referencesProvider': True,
+            },
+            'serverInfo': {'name': 'symbolnav'},
+        }
+
+    def shutdown(self, params: dict) -> None:
+        self.shutdown_requested = True
+
+    def did_open(self, params: dict):
+        item = params['textDocument']
+        document = Document(item['uri'], item['text'], item.get('version', 0))
+        self.documents[document.uri] = document
+        self.analyze(document)
+
+    def did_change(self, params: dict):
+        document = self.documents[params['textDocument']['uri']]
+        for change in params['contentChanges']:
+            document.apply(change)
+        document.version = params['textDocument'].get('version', document.version)
+        self.analyze(document)
+
+    def did_close(self, params: dict):
+        document = self.documents.pop(params['textDocument']['uri'], None)
+        if document is not None:
+            self.publish(document.uri, [])
+
+    def analyze(self, document: Document):
+        """Bring the spans and their parse results up to date with the text, then publish diagnostics."""
+        previous = document.table
+        table = document.table = self.extractor.update(previous, latex=document.text)
+        document._line_index = table.line_index  # Updated with the spans
+        error = self.extractor.error
+        document.lex_error = (error.token.lexpos, error.message) if error is not None else None
+
+        # Spans kept or reused by the update have the same math, so only those lexed again
+        # are parsed; the others keep their results
+        head, scanned, tail, shifted = table.edit
+        values = [table.span(index).value for index in range(head, head + scanned)]
+        document.entries = document.entries[:head] + self._parse(values, document.path) + document.entries[tail:]
+
+        # Likewise for diagnostics: those of spans that only moved by whole lines are shifted
+        moved = head + scanned - tail  # Change of the index of the reused spans
+        old = document.span_diagnostics
+        diagnostics = old[:bisect_left(old, (head,))]
+        for index in range(head, head + scanned):
+            diagnostic = self.span_diagnostic(document, index)
+            if diagnostic is not None:
+                diagnostics.append((index, diagnostic))
+        lines = 0
+        if previous is not None and shifted < len(previous):
+            lines = table.line(shifted + moved) - previous.line(shifted)
+        for old_index, diagnostic in old[bisect_left(old, (tail,)):]:
+            if old_index < shifted:
+                diagnostic = cast(dict, self.span_diagnostic(document, old_index + moved))
+            elif lines:
+                diagnostic = _shift_lines(diagnostic, lines)
+            diagnostics.append((old_index + moved, diagnostic))
+        document.span_diagnostics = diagnostics
+        self.publish(document.uri, self.diagnostics(document), document.version)
+
+    def _parse(self, values: list[str], path: str) -> list[Optional[CacheEntry]]:
+        try:
+            return self.symbol_extractor.extract_entries([(value, path, 1, 1) for value in values])
+        except Exception:
+            pass  # Some source crashed the parser, find it below
+        entries: list[Optional[CacheEntry]] = []
+        for value in values:
+            try:
+                entries.append(self.symbol_extractor.extract_entries([(value, path, 1, 1)])[0])
+            except Exception:
+                entries.append(None)
+        return entries
+
+    def span_diagnostic(self, document: Document, index: int) -> Optional[dict]:
+        """Diagnostic of the span at `index`, None if its math parses."""
+        entry = document.entries[index]
+        if entry is not None and not isinstance(entry, CachedError):
+            return None
+        latex_math = cast(SpanTable, document.table).span(index)
+        value_start = latex_math.span[0] + len(latex_math.marks[0])
+        if isinstance(entry, CachedError):
+            message = entry.message if entry.note is None else f"{entry.message}\nNote: {entry.note}"
+            offset = value_start + entry.pos
+        else:
+            message, offset = "The parser failed on this math", value_start
+        return {
+            'range': document.range(offset, offset + 1),
+            'severity': SEVERITY_ERROR,
+            'source': 'symbolnav',
+            'message': message,
+        }
+
+    def diagnostics(self, document: Document) -> list[dict]:
+        diagnostics = [diagnostic for _, diagnostic in document.span_diagnostics]
+        if document.lex_error is not None:
+            offset, message = document.lex_error
+            diagnostics.append({
+                'range': document.range(offset, min(offset + 1, len(document.text))),
+                'severity': SEVERITY_ERROR,
+                'source': 'symbolnav',
+                'message': message,
+            })
+        return diagnostics
+
+    def publish(self, uri: str, diagnostics: list[dict], version: Optional[int] = None):
+        params: dict = {'uri': uri, 'diagnostics': diagnostics}
+        if version is not None:
+            params['version'] = version
+        write_message(self.writer, {'jsonrpc': '2.0', 'method': 'textDocument/publishDiagnostics', 'params': params})
+
+    def symbol_at(self, params: dict) -> Optional[tuple[Document, ASTNode]]:
+        """The document and the symbol under the cursor of a `TextDocumentPositionParams`."""
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is None:
+            return None
+        offset = document.offset(params['position'])
+        index = document.span_at(offset)
+        if index is None:
+            return None
+        entry = document.entries[index]
+        if entry is None or isinstance(entry, CachedError) or not entry:
+            return None
+        latex_math = document.table.span(index)
+        value_offset = offset - latex_math.span[0] - len(latex_math.marks[0])
+        value = latex_math.value
+        # Symbols carry no positions: parse the symbol-like text under the cursor and take the
+        # first of its symbols, the outermost, that is one of the symbols of the span
+        for match in SYMBOL_PATTERN.finditer(value):
+            if match.start() <= value_offset < match.end():
+                candidates = self._parse([match.group()], document.path)[0]
+                if candidates is not None and not isinstance(candidates, CachedError):
+                    for symbol in candidates:
+                        if symbol in entry:
+                            return document, symbol
+                break
+        return None
+
+    def hover(self, params: dict) -> Optional[dict]:
+        found = self.symbol_at(params)
+        if found is None:
+            return None
+        document, symbol = found
+        occurrences = document.occurrences(symbol)
+        lines = [f"**${Renderer.to_latex(symbol)}$** appears {len(occurrences)} times", ""]
+        for latex_math in occurrences[:HOVER_OCCURRENCES]:
+            source = f"{latex_math.marks[0]}{latex_math.value}{latex_math.marks[1]}".replace('\n', ' ')
+            lines.append(f"- line {latex_math.line}, column {latex_math.column}: `{source}`")
+        if len(occurrences) > HOVER_OCCURRENCES:
+            lines.append(f"- and {len(occurrences) - HOVER_OCCURRENCES} more")
+        return {'contents': {'kind': 'markdown', 'value': '\n'.join(lines)}}
+
+    def definition(self, params: dict) -> Optional[dict]:
+        found = self.symbol_at(params)
+        if found is None:
+            return None
+        document, symbol = found
+        return self._location(document, document.occurrences(symbol)[0])
+
+    def references(self, params: dict) -> Optional[list[dict]]:
+        found = self.symbol_at(params)
+        if found is None:
+            return None
+        document, symbol = found
+        return [self._location(document, latex_math) for latex_math in document.occurrences(symbol)]
+
+    @staticmethod
+    def _location(document: Document, latex_math: LaTeXMath) -> dict:
+        start, end = latex_math.span
+        return {'uri': document.uri, 'range': document.range(start + len(latex_math.marks[0]), end - len(latex_math.marks[1]))}
@@ -0,0 +1,39 @@
+"""Locations of SymbolNav's files on disk.
+
+Only the standard library is imported here, so the `snav` client can find the daemon
+socket without loading PLY.
+"""
+from typing import Optional
+import os
+
+
+def cache_dir() -> Optional[str]:
+    """Directory for persistent caches, or None if caching is disabled or unavailable.
+
+    Defaults to `$XDG_CACHE_HOME/symbolnav` (`~/.cache/symbolnav`), can be moved with
+    `SYMBOLNAV_CACHE_DIR` and disabled by setting `SYMBOLNAV_CACHE_DIR` to an empty string.
+    """
+    path = os.environ.get('SYMBOLNAV_CACHE_DIR')
+    if path is None:
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(cache_home, 'symbolnav')
+    if not path:
+        return None
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    return path
+
+
+def socket_path() -> Optional[str]:
+    """Path of the daemon socket, or None if the daemon is disabled.
+
+    Defaults to `snav.sock` in the cache directory, can be moved with `SYMBOLNAV_SOCKET`
+    and disabled by setting `SYMBOLNAV_SOCKET` to an empty string.
+    """
+    path = os.environ.get('SYMBOLNAV_SOCKET')
+    if path is None:
+        directory = cache_dir()
+        path = os.path.join(directory, 'snav.sock') if directory is not None else ''
+    return path or None
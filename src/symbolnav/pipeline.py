@@ -0,0 +1,103 @@
+"""Streaming extraction pipeline: math spans, then symbol occurrences, then aggregated results.
+
+Each stage is a generator consuming the previous one, so occurrences can be written out
+while the sources are still being scanned, with memory bounded by the read chunk, the
+parse cache and the batch size rather than by the corpus.
+"""
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import batched
+from typing import Iterable, Iterator, NamedTuple, TextIO
+import json
+
+from .latex_math_extractor import LaTeXMath, LaTeXMathExtractor
+from .symbol_extractor import ASTNode, SymbolExtractor
+from .renderer import Renderer
+
+# Spans sent to the worker processes at a time when extracting with several jobs
+BATCH_SIZE = 4096
+
+
+class Occurrence(NamedTuple):
+    symbol: ASTNode
+    file: str  # File name as given, the span's own `filename` is an absolute path
+    latex_math: LaTeXMath
+
+    @property
+    def line(self) -> int:
+        return self.latex_math.line
+
+    @property
+    def column(self) -> int:
+        return self.latex_math.column
+
+
+def iter_spans(files: Iterable[str], chunk_size: int = 1 << 20) -> Iterator[tuple[str, LaTeXMath]]:
+    """(file, span) for the math spans of each file, read `chunk_size` characters at a time."""
+    extractor = LaTeXMathExtractor()
+    for file in files:
+        for latex_math in extractor.stream(file, chunk_size=chunk_size):
+            yield file, latex_math
+
+
+def iter_occurrences(
+    spans: Iterable[tuple[str, LaTeXMath]],
+    symbol_extractor: SymbolExtractor,
+    jobs: int = 1,
+    ignore_errors: bool = False,
+) -> Iterator[Occurrence]:
+    """Symbol occurrences of each span, in span order.
+
+    With `jobs` other than 1, spans are extracted in batches of `BATCH_SIZE` on worker processes.
+    """
+    if jobs == 1:
+        for file, latex_math in spans:
+            for symbol in symbol_extractor.extract_symbol(
+                latex_math.value, file, latex_math.line, latex_math.column, ignore_errors=ignore_errors
+            ):
+                yield Occurrence(symbol, file, latex_math)
+        return
+    for batch in batched(spans, BATCH_SIZE):
+        extracted = symbol_extractor.extract_batch(
+            [(latex_math.value, file, latex_math.line, latex_math.column) for file, latex_math in batch],
+            jobs=jobs,
+            ignore_errors=ignore_errors,
+        )
+        for (file, latex_math), symbols in zip(batch, extracted):
+            for symbol in symbols:
+                yield Occurrence(symbol, file, latex_math)
+
+
+def aggregate(occurrences: Iterable[Occurrence]) -> dict[ASTNode, OrderedDict[tuple[str, int, int], LaTeXMath]]:
+    """Occurrences grouped by symbol, each keyed by (file, line, column) in order of appearance."""
+    symbols: dict[ASTNode, OrderedDict[tuple[str, int, int], LaTeXMath]] = {}
+    for occurrence in occurrences:
+        if occurrence.symbol not in symbols:
+            symbols[occurrence.symbol] = OrderedDict()
+        symbols[occurrence.symbol][(occurrence.file, occurrence.line, occurrence.column)] = occurrence.latex_math
+    return symbols
+
+
+# Symbols repeat across a corpus, so their rendering is memoized with a bounded cache
+render_symbol = lru_cache(maxsize=1 << 16)(Renderer.to_latex)
+
+
+def occurrence_record(occurrence: Occurrence) -> dict:
+    return {
+        'symbol': render_symbol(occurrence.symbol),
+        'file': occurrence.file,
+        'line': occurrence.line,
+        'column': occurrence.column,
+        'type': occurrence.latex_math.type,
+        'math': occurrence.latex_math.value,
+    }
+
+
+def write_ndjson(occurrences: Iterable[Occurrence], out: TextIO) -> int:
+    """Write one JSON record per occurrence as it is produced; returns the number written."""
+    count = 0
+    for occurrence in occurrences:
+        out.write(json.dumps(occurrence_record(occurrence), ensure_ascii=False))
+        out.write('\n')
+        count += 1
+    return count
@@ -36,63 +36,63 @@ class Renderer:
     @staticmethod
     def _render_to_latex(node: ASTNode | str | list | frozenset | tuple | None) -> str:  # TODO: change to use generator
         if isinstance(node, ASTNode):
-            left = Renderer._render_to_latex(node.attributes['left']) if 'left' in node.attributes else None
-            right = Renderer._render_to_latex(node.attributes['right']) if 'right' in node.attributes else None
+            left = Renderer._render_to_latex(node.left) if 'left' in node.fields else None
+            right = Renderer._render_to_latex(node.right) if 'right' in node.fields else None
             left_blank = " " if left else ""
             right_blank = " " if right else ""
 
             match node.node_type:
                 case 'SymbolPostfix':
-                    return (f"{Renderer._render_to_latex(node.attributes['symbol'])}"
-                            f"{Renderer._render_to_latex(node.attributes['postfix'])}")
+                    return (f"{Renderer._render_to_latex(node.symbol)}"
+                            f"{Renderer._render_to_latex(node.postfix)}")
                 case 'Symbol':
-                    if node.attributes['symbol_type'] in ['other', 'greek']:
-                        return f"{node.attributes['symbol']} "
-                    return node.attributes['symbol']
+                    if node.symbol_type in ['other', 'greek']:
+                        return f"{node.symbol} "
+                    return node.symbol
                 case 'Format' | 'FormatText':
-                    return (f"{node.attributes['format']}"
+                    return (f"{node.format}"
                             "{"
-                            f"{Renderer._render_to_latex(node.attributes['content'])}"
+                            f"{Renderer._render_to_latex(node.content)}"
                             "}")
                 case 'FormatOp':
-                    return (f"{node.attributes['op']}"
+                    return (f"{node.op}"
                             "{"
-                            f"{Renderer._render_to_latex(node.attributes['content'])}"
+                            f"{Renderer._render_to_latex(node.content)}"
                             "}")
                 case 'GeneralPostfix':
-                    return (f"{Renderer._render_to_latex(node.attributes['content'])}"
-                            f"{Renderer._render_to_latex(node.attributes['postfix'])}")
+                    return (f"{Renderer._render_to_latex(node.content)}"
+                            f"{Renderer._render_to_latex(node.postfix)}")
                 case 'Relation':
                     return (f"{left}"
-                            f"{left_blank}{node.attributes['op']}{right_blank}"
+                            f"{left_blank}{node.op}{right_blank}"
                             f"{right}")
                 case 'Additive':
                     return (f"{left}"
-                            f"{left_blank}{node.attributes['op']}{right_blank}"
+                            f"{left_blank}{node.op}{right_blank}"
                             f"{right}")
                 case 'Supscript':
                     return ("^{"
-                            f"{Renderer._render_to_latex(node.attributes['value'])}"
+                            f"{Renderer._render_to_latex(node.value)}"
                             "}")
                 case 'Subscript':
                     return ("_{"
-                            f"{Renderer._render_to_latex(node.attributes['value'])}"
+                            f"{Renderer._render_to_latex(node.value)}"
                             "}")
                 case 'List':
-                    return node.attributes['separator'].join(Renderer._render_to_latex(item) for item in node.attributes['items'])
+                    return node.separator.join(Renderer._render_to_latex(item) for item in node.items)
                 case 'MP':
                     return (f"{left}"
-                            f"{left_blank}{node.attributes['op']}{right_blank}"
+                            f"{left_blank}{node.op}{right_blank}"
                             f"{right}")
                 case 'Coated':
-                    return (f"{node.attributes['coat_left']}"
-                            f"{Renderer._render_to_latex(node.attributes['content'])}"
-                            f"{node.attributes['coat_right']}")
+                    return (f"{node.coat_left}"
+                            f"{Renderer._render_to_latex(node.content)}"
+                            f"{node.coat_right}")
                 case 'Fraction':
                     return ("\\frac{"
-                            f"{Renderer._render_to_latex(node.attributes['numerator'])}"
+                            f"{Renderer._render_to_latex(node.numerator)}"
                             "}{"
-                            f"{Renderer._render_to_latex(node.attributes['denominator'])}"
+                            f"{Renderer._render_to_latex(node.denominator)}"
                             "}")
                 case _:
                     raise ValueError(f"Unknown node type: {node.node_type}")
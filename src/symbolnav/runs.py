@@ -0,0 +1,61 @@
+"""Columns of positions that edits shift lazily, for `LineIndex` and `SpanTable`.
+
+A column holds positions of items in document order, such as line starts or span offsets.
+An edit shifts all the positions after it; rather than rewriting them, the column is cut
+into runs whose items are stored minus the shifts of their run. A run is a tuple
+`(first, *shifts)` covering the items from `first` to the first of the next run, so an edit
+only splices in the changed items and adds to the shifts of the runs after them.
+"""
+from array import array
+from bisect import bisect_right
+from operator import itemgetter
+
+# More runs are folded into the columns, which then have a single run without shifts
+MAX_RUNS = 32
+
+Run = tuple[int, ...]
+
+
+def run_at(runs: list[Run], index: int) -> Run:
+    """The run of the item at `index`."""
+    if len(runs) == 1:
+        return runs[0]
+    return runs[bisect_right(runs, index, key=itemgetter(0)) - 1]
+
+
+def splice(runs: list[Run], size: int, head: int, inserted: int, tail: int, shifts: Run) -> list[Run]:
+    """Runs of a column of `size` items once items [head, tail) are replaced by `inserted`
+    items stored as they are, and the items from `tail` on are shifted by `shifts`."""
+    moved = head + inserted - tail
+    spliced = runs[:bisect_right(runs, head - 1, key=itemgetter(0))]
+    spliced.append((head, *(0 for _ in shifts)))
+    for first, *run_shifts in runs[max(bisect_right(runs, tail, key=itemgetter(0)) - 1, 0):]:
+        spliced.append((max(first, tail) + moved, *(a + b for a, b in zip(run_shifts, shifts))))
+    # Runs left without items give way to the next one, equal neighbours are merged
+    merged: list[Run] = []
+    for run, next_run in zip(spliced, spliced[1:] + [(size + moved,)]):
+        if run[0] < next_run[0] and (not merged or merged[-1][1:] != run[1:]):
+            merged.append(run)
+    return merged or [(0, *(0 for _ in shifts))]
+
+
+def bisect(column: array, runs: list[Run], shift: int, value: int) -> int:
+    """`bisect_right` of `value` in the positions of `column`, whose runs shift by `run[shift]`."""
+    if len(runs) == 1:
+        return bisect_right(column, value - runs[0][shift])
+    index = bisect_right(range(len(runs)), value, key=lambda r: column[runs[r][0]] + runs[r][shift]) - 1
+    if index < 0:
+        return 0
+    end = runs[index + 1][0] if index + 1 < len(runs) else len(column)
+    return bisect_right(column, value - runs[index][shift], runs[index][0], end)
+
+
+def positions(column: array, runs: list[Run], shift: int) -> array:
+    """The positions of `column`, whose runs shift by `run[shift]`."""
+    if len(runs) == 1 and not runs[0][shift]:
+        return column
+    result = array(column.typecode)
+    for run, next_run in zip(runs, runs[1:] + [(len(column),)]):
+        part = column[run[0]:next_run[0]]
+        result += array(column.typecode, [value + run[shift] for value in part]) if run[shift] else part
+    return result
@@ -0,0 +1,121 @@
+"""`snav serve`: a daemon answering `snav` commands with warm extractors, caches and indexes.
+
+Clients connect to a Unix domain socket and send one JSON line, `{"args": [...], "cwd": ...,
+"prog": ..., "isatty": ..., "columns": ...}`; the daemon runs the command as `snav` would in
+that directory, rendering for the client's terminal, and replies with one JSON line,
+`{"stdout": ..., "stderr": ..., "status": ...}`. Commands run one at a time, as they share
+the working directory and the redirected output of the process, so a client that sends
+nothing for `REQUEST_TIMEOUT` seconds is dropped, and a malformed request answered with an
+error.
+"""
+import contextlib
+import io
+import os
+import signal
+import socket
+import sys
+import traceback
+from typing import Optional
+
+from rich.console import Console
+
+from . import cli
+from .client import receive, send
+from .symbol_extractor import exceptions
+
+REQUEST_TIMEOUT = 5.0
+
+
+@contextlib.contextmanager
+def _console(console: Console):
+    # The commands and math errors print through module consoles, swapped for the request
+    modules = (cli, exceptions)
+    previous = [module.console for module in modules]
+    for module in modules:
+        module.console = console
+    try:
+        yield
+    finally:
+        for module, module_console in zip(modules, previous):
+            module.console = module_console
+
+
+def _handle(message: dict) -> dict:
+    stdout, stderr = io.StringIO(), io.StringIO()
+    status = 0
+    # Styled and wrapped as `snav` run in the client's terminal would
+    columns = message.get('columns')
+    console = Console(
+        file=stdout, highlight=False, force_terminal=bool(message.get('isatty')),
+        width=columns if isinstance(columns, int) and columns > 0 else None,
+    )
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr), _console(console):
+        try:
+            os.chdir(message['cwd'])
+            cli.dispatch(message['args'], prog=message.get('prog'))
+        except SystemExit as e:
+            if isinstance(e.code, str):
+                print(e.code, file=sys.stderr)
+            status = e.code if isinstance(e.code, int) else int(e.code is not None)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+    return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'status': status}
+
+
+def _respond(connection: socket.socket) -> Optional[dict]:
+    """The response to the request on `connection`, None if the client sent none in time."""
+    try:
+        message = receive(connection)
+    except OSError:
+        return None  # Silent for too long, or went away
+    except ValueError as e:
+        error = str(e)
+    else:
+        if message is None:
+            return None
+        if isinstance(message, dict):
+            return _handle(message)
+        error = "not a JSON object"
+    return {'stdout': '', 'stderr': f"Malformed request: {error}\n", 'status': 2}
+
+
+def serve(path: str):
+    """Listen on the socket at `path` until interrupted or terminated."""
+    if os.path.exists(path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                os.remove(path)  # Left behind by a daemon that did not exit cleanly
+            else:
+                raise SystemExit(f"A daemon is already listening on {path}")
+
+    # SIGTERM stops the daemon like Ctrl-C, so the caches are saved either way
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    session = cli.Session.load()
+    cli.daemon_session = session
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        listener.bind(path)
+        listener.listen()
+        print(f"Listening on {path}", flush=True)
+        while True:
+            connection, _ = listener.accept()
+            with connection:
+                connection.settimeout(REQUEST_TIMEOUT)
+                response = _respond(connection)
+                if response is None:
+                    continue
+                try:
+                    send(connection, response)
+                except OSError:
+                    pass  # The client went away
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        if os.path.exists(path):
+            os.remove(path)
+        cli.daemon_session = None
+        session.close()
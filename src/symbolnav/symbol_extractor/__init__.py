@@ -1,13 +1,26 @@
 from .exceptions import MathSyntaxError, MathValueError
+from .columns import TOKEN_TYPES, TokenColumns, parse_columns, tokenize_many
 from .extractor import SymbolExtractor
 from .interpreter import LaTeXMathInterpreter
-from .mast import ASTNode, to_dict
+from .lexer import register_command
+from .parse_cache import CachedError, ParseCache
+from .mast import ASTNode, fingerprint, sort_key, sort_symbols, to_dict
 
 __all__ = [
     "MathSyntaxError", 
     "MathValueError", 
     "LaTeXMathInterpreter", 
+    "register_command",
+    "TOKEN_TYPES",
+    "TokenColumns",
+    "tokenize_many",
+    "parse_columns",
     "SymbolExtractor", 
+    "ParseCache",
+    "CachedError",
     "ASTNode", 
+    "fingerprint",
+    "sort_key",
+    "sort_symbols",
     "to_dict",
 ]
\ No newline at end of file
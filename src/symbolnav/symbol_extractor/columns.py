@@ -0,0 +1,198 @@
+"""Columnar tokens of a batch of math sources, and parsing straight from them.
+
+`tokenize_many` lexes many sources at once into flat arrays instead of one PLY `LexToken`
+per token, for batch analytics such as token or command frequencies. The arrays support
+the buffer protocol, so `numpy.frombuffer` views them without copying. `parse_columns`
+runs the LALR tables of the parser over those arrays, with token values sliced from the
+sources and no token objects at all.
+"""
+from array import array
+from typing import Iterable, NamedTuple, Union
+import re
+import threading
+from .interpreter import LaTeXMathInterpreter
+from .lexer import COMMANDS, TEXT_COMMANDS, longest_command, t_ignore, tokens
+from .mast import ASTNode
+
+# Token type of each type id in `TokenColumns.types`
+TOKEN_TYPES: tuple[str, ...] = tuple(tokens)
+TOKEN_TYPE_IDS = {token_type: i for i, token_type in enumerate(TOKEN_TYPES)}
+
+_BRACE = re.compile(r'[{}]')
+_TEXT, _R_BRACE = TOKEN_TYPE_IDS['TEXT'], TOKEN_TYPE_IDS['R_BRACE']
+
+
+class TokenColumns(NamedTuple):
+    """Tokens of a batch of sources, as parallel arrays with one entry per token.
+
+    The tokens of source `i` are `offsets[i]` to `offsets[i + 1]`. Token `k` is of type
+    `TOKEN_TYPES[types[k]]` and its value is `sources[source_ids[k]][starts[k]:ends[k]]`.
+    `errors[i]` is the position of the illegal character that stopped lexing source `i`,
+    or -1 if it was lexed to the end.
+    """
+    sources: list[str]
+    types: array
+    starts: array
+    ends: array
+    source_ids: array
+    offsets: array
+    errors: array
+
+    def value(self, token: int) -> str:
+        return self.sources[self.source_ids[token]][self.starts[token]:self.ends[token]]
+
+
+class NotParsed(Exception):
+    """The source has a lexing or syntax error; `LaTeXMathInterpreter` reports it with its location."""
+
+
+# What a match of each group of the lexer's master regexes is
+_TOKEN, _COMMAND, _L_BRACE = range(3)
+_tables_lock = threading.Lock()
+_loaded_tables = None
+
+
+def _tables():
+    # The master regexes of the lexer, with the kind and type id of each of their groups,
+    # and the parser; shared with `LaTeXMathInterpreter` and loaded once for all threads
+    global _loaded_tables
+    if _loaded_tables is None:
+        with _tables_lock:
+            if _loaded_tables is None:
+                _loaded_tables = _load_tables()
+    return _loaded_tables
+
+
+def _load_tables():
+    interpreter = LaTeXMathInterpreter()
+    master = []
+    for regex, rules in interpreter.lexer.lexstatere['INITIAL']:
+        groups = [None] * len(rules)
+        for group, rule in enumerate(rules):
+            if rule is None or rule[1] is None:
+                continue
+            function, token_type = rule
+            if function is None:
+                groups[group] = (_TOKEN, TOKEN_TYPE_IDS[token_type])
+            elif function.__name__ == 't_command':
+                groups[group] = (_COMMAND, None)
+            elif function.__name__ == 't_L_BRACE':
+                groups[group] = (_L_BRACE, TOKEN_TYPE_IDS[token_type])
+            else:
+                raise AssertionError(f"Lexer rule {function.__name__} is not handled by tokenize_many")
+        master.append((regex.match, groups))
+    return master, interpreter.parser
+
+
+def tokenize_many(sources: Iterable[str]) -> TokenColumns:
+    """Lex each of `sources` as `LaTeXMathInterpreter` does, into one `TokenColumns`."""
+    sources = list(sources)
+    master, _ = _tables()
+    columns = TokenColumns(sources, array('B'), array('l'), array('l'), array('l'), array('l', [0]), array('l'))
+    for source_id, latex in enumerate(sources):
+        columns.errors.append(_tokenize(latex, source_id, master, columns))
+        columns.offsets.append(len(columns.types))
+    return columns
+
+
+def _tokenize(latex: str, source_id: int, master: list, columns: TokenColumns) -> int:
+    # Appends the tokens of `latex`, returns the position of an illegal character or -1
+    add_type, add_start, add_end = columns.types.append, columns.starts.append, columns.ends.append
+    count = len(columns.types)
+    position, length = 0, len(latex)
+    expect_text = False
+    while position < length:
+        if latex[position] in t_ignore:
+            position += 1
+            continue
+        for match_at, groups in master:
+            match = match_at(latex, position)
+            if match:
+                break
+        else:
+            return _finish(columns, source_id, count, position)
+        kind, type_id = groups[match.lastindex]
+        end = match.end()
+        if kind == _COMMAND:
+            command = longest_command(match.group())
+            if command is None:
+                return _finish(columns, source_id, count, position)
+            token_type = COMMANDS[command]
+            type_id = TOKEN_TYPE_IDS[token_type]
+            end = position + len(command)
+            expect_text = expect_text or token_type in TEXT_COMMANDS
+        add_type(type_id)
+        add_start(position)
+        add_end(end)
+        position = end
+        if kind == _L_BRACE and expect_text:
+            # Text mode, up to the matching brace: nonempty text is a TEXT token and its
+            # closing brace is lexed again as R_BRACE, an empty one is the R_BRACE itself
+            expect_text = False
+            depth = 1
+            while depth:
+                brace = _BRACE.search(latex, end)
+                if brace is None:
+                    return _finish(columns, source_id, count, -1)  # Unclosed text runs to the end
+                end = brace.end()
+                depth += 1 if brace.group() == '{' else -1
+            if brace.start() > position:
+                add_type(_TEXT)
+                add_start(position)
+                add_end(brace.start())
+                position = brace.start()
+            else:
+                add_type(_R_BRACE)
+                add_start(brace.start())
+                add_end(end)
+                position = end
+    return _finish(columns, source_id, count, -1)
+
+
+def _finish(columns: TokenColumns, source_id: int, count: int, error: int) -> int:
+    columns.source_ids.extend([source_id] * (len(columns.types) - count))
+    return error
+
+
+def parse_columns(columns: TokenColumns, source_id: int) -> Union[ASTNode, tuple, None]:
+    """The tree `LaTeXMathInterpreter` builds for source `source_id` of `columns`.
+
+    Raises `NotParsed` if the source has a lexing or syntax error.
+    """
+    if columns.errors[source_id] >= 0:
+        raise NotParsed
+    _, parser = _tables()
+    actions, goto, productions, defaulted_states = parser.action, parser.goto, parser.productions, parser.defaulted_states
+    latex = columns.sources[source_id]
+    types, starts, ends = columns.types, columns.starts, columns.ends
+    token, stop = columns.offsets[source_id], columns.offsets[source_id + 1]
+
+    states, values = [0], [None]
+    state = 0
+    while True:
+        if state in defaulted_states:
+            action = defaulted_states[state]
+        else:
+            action = actions[state].get(TOKEN_TYPES[types[token]] if token < stop else '$end')
+        if action is None:
+            raise NotParsed
+        if action > 0:
+            # Shift
+            state = action
+            states.append(state)
+            values.append(latex[starts[token]:ends[token]])
+            token += 1
+        elif action < 0:
+            # Reduce: the grammar rules only index, slice and measure their argument
+            production = productions[-action]
+            p = [None]
+            if production.len:
+                p.extend(values[-production.len:])
+                del values[-production.len:]
+                del states[-production.len:]
+            production.callable(p)
+            state = goto[states[-1]][production.name]
+            states.append(state)
+            values.append(p[0])
+        else:
+            return values[-1]
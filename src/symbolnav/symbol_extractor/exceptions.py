@@ -3,6 +3,7 @@ from ply.lex import LexToken, Lexer
 from rich.console import Console
 from rich.style import Style
 from rich.text import Text
+from ..line_index import LineIndex
 
 
 console = Console(highlight=False)
@@ -30,16 +31,36 @@ class MathError(Exception):
 
     def __init__(self, message: str, token: Optional[LexToken] = None, note: Optional[str] = None):
         token_ = cast(ActualLexToken, token)
-        self.abs_pos = token_.lexpos
-        self.lexdata = token_.lexer.lexdata
-        self.src_lineno = token_.lexer.source_line
-        self.src_column = token_.lexer.source_column
-        self.file = token_.lexer.file
+        self._locate(
+            message, note, token_.lexer.lexdata, token_.lexpos, LineIndex.of(token_.lexer),
+            token_.lexer.file, token_.lexer.source_line, token_.lexer.source_column
+        )
+
+    @classmethod
+    def at(
+        cls, message: str, lexdata: str, pos: int, 
+        file: str, line: int, column: int, note: Optional[str] = None
+    ) -> 'MathError':
+        """Build the error at `pos` of the snippet `lexdata`, which starts at `line`, `column` of `file`."""
+        error = cls.__new__(cls, message)
+        error._locate(message, note, lexdata, pos, LineIndex(lexdata), file, line, column)
+        return error
+
+    def _locate(
+        self, message: str, note: Optional[str], lexdata: str, pos: int, line_index: LineIndex, 
+        file: str, line: int, column: int
+    ):
+        self.detail = message
+        self.note = note
+        self.abs_pos = pos
+        self.lexdata = lexdata
+        self.src_lineno = line
+        self.src_column = column
+        self.file = file
         
         assert 0 <= self.abs_pos < len(self.lexdata), "Invalid position"
         
-        rel_lineno = self.lexdata.count('\n', 0, self.abs_pos) + 1
-        rel_column = self.abs_pos - self.lexdata.rfind('\n', 0, self.abs_pos)
+        rel_lineno, rel_column = line_index.position(self.abs_pos)
         self.abs_lineno = self.src_lineno + rel_lineno - 1
         self.abs_column = rel_column
         if rel_lineno == 1: self.abs_column += self.src_column - 1
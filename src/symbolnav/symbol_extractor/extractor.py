@@ -1,48 +1,231 @@
-from typing import Generator, Optional
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterator, Optional, Sequence, Union
+import os
+import queue
+import threading
+from .columns import NotParsed, parse_columns, tokenize_many
+from .fast_path import parse_trivial
 from .interpreter import LaTeXMathInterpreter
 from .mast import ASTNode
-from .exceptions import MathSyntaxError, MathValueError
+from .exceptions import MathError, MathSyntaxError, MathValueError
+from .parse_cache import CacheEntry, CachedError, ParseCache
+
+# Math sources to extract in batch: (latex, file, line, column), as passed to `extract_symbol`
+Source = tuple[str, str, int, int]
 
 
 class SymbolExtractor:
+    """Extracts the symbols of math sources. Threads can share an extractor and its cache.
+
+    Math is parsed without per-call state, from columnar tokens; the PLY interpreters that
+    locate errors are taken from a pool, so no two threads use the same one.
+    """
 
-    def __init__(self):
+    def __init__(self, cache: Optional[ParseCache] = None):
         self.interpreter = LaTeXMathInterpreter()
+        self.cache = cache
+        # Sources parsed by the fast path for trivial math or by the parser, here or on workers
+        self.counters: Counter[str] = Counter()
+        self._interpreters: queue.SimpleQueue[LaTeXMathInterpreter] = queue.SimpleQueue()
+        self._interpreters.put(self.interpreter)
+        self._lock = threading.Lock()
 
     def extract_symbol(
-        self, 
-        latex: str, 
-        file: str, 
-        line: int, 
+        self,
+        latex: str,
+        file: str,
+        line: int,
         column: int,
         ignore_errors: bool = False
-    ) -> Generator[ASTNode]:
+    ) -> Iterator[ASTNode]:
+        entry = self.cache.get(latex) if self.cache is not None else None
+        error = None
+        if entry is None:
+            entry, error = self._parse(latex, file, line, column)
+            if self.cache is not None:
+                self.cache.put(latex, entry)
+        return _symbols(entry, error, latex, file, line, column, ignore_errors)
+
+    def extract_batch(
+        self,
+        sources: Sequence[Source],
+        jobs: int = 1,
+        ignore_errors: bool = False,
+        threads: bool = False,
+    ) -> list[tuple[ASTNode, ...]]:
+        """Extract the symbols of each source, parsing on `jobs` worker processes (0 for all CPUs).
+
+        Each distinct source missing from the cache is parsed once, by a worker with its own
+        interpreter. Errors are reported here, in the order of `sources`, exactly as a serial
+        run of `extract_symbol` would report them.
+
+        With `threads`, the workers are threads of this process sharing this extractor, which
+        run in parallel on free-threaded Python and need no pickling of the results.
+        """
+        jobs = jobs or os.cpu_count() or 1
+        if jobs == 1:
+            return [tuple(self.extract_symbol(*source, ignore_errors=ignore_errors)) for source in sources]
+
+        entries = self._entries(sources, jobs, threads)
+        results = []
+        for latex, file, line, column in sources:
+            entry = entries[latex]
+            if isinstance(entry, BaseException):
+                raise entry  # Raised where the serial run would have raised it
+            results.append(tuple(_symbols(entry, None, latex, file, line, column, ignore_errors)))
+        return results
+
+    def extract_entries(self, sources: Sequence[Source], jobs: int = 1, threads: bool = False) -> list[CacheEntry]:
+        """Symbols or parse error of each source, parsed like `extract_batch` but without reporting errors."""
+        jobs = jobs or os.cpu_count() or 1
+        entries = self._entries(sources, jobs, threads)
+        results = []
+        for latex, _, _, _ in sources:
+            entry = entries[latex]
+            if isinstance(entry, BaseException):
+                raise entry
+            results.append(entry)
+        return results
+
+    def _entries(self, sources: Sequence[Source], jobs: int, threads: bool = False) -> dict[str, Union[CacheEntry, BaseException]]:
+        # Each distinct source missing from the cache is parsed once, here or on the workers
+        entries: dict[str, Union[CacheEntry, BaseException]] = {}
+        pending = []
+        for latex in dict.fromkeys(source[0] for source in sources):
+            entry = self.cache.get(latex) if self.cache is not None else None
+            if entry is None:
+                pending.append(latex)
+            else:
+                entries[latex] = entry
+
+        if pending and jobs == 1:
+            for latex in pending:
+                entries[latex] = entry = self._parse(latex, file="", line=1, column=1)[0]
+                if self.cache is not None:
+                    self.cache.put(latex, entry)
+        elif pending:
+            chunks = _chunk_by_length(pending, jobs)
+            if threads:
+                # Threads count into this extractor, worker processes send their counts back
+                executor = ThreadPoolExecutor(max_workers=jobs)
+                parse_chunk = lambda chunk: (self._parse_chunk(chunk), ())
+            else:
+                executor, parse_chunk = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker), _extract_chunk
+            with executor:
+                for chunk, (chunk_entries, counters) in zip(chunks, executor.map(parse_chunk, chunks)):
+                    self.counters.update(counters)
+                    for latex, entry in zip(chunk, chunk_entries):
+                        entries[latex] = entry
+                        if self.cache is not None and not isinstance(entry, BaseException):
+                            self.cache.put(latex, entry)
+        return entries
+
+    @property
+    def fast_path_ratio(self) -> float:
+        """Fraction of the sources parsed so far that took the fast path."""
+        total = self.counters['fast_path'] + self.counters['parser']
+        return self.counters['fast_path'] / total if total else 0.0
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _parse(self, latex: str, file: str, line: int, column: int) -> tuple[CacheEntry, Optional[MathError]]:
+        ast = parse_trivial(latex)
+        if ast is not None:
+            self._count('fast_path')
+            return tuple(_traverse(ast)), None
+        self._count('parser')
         try:
-            ast = self.interpreter.parse(latex, file=file, line=line, column=column)
-        except (MathSyntaxError, MathValueError) as e:
-            if not ignore_errors:
-                e.display_error()
-            return iter(())  # type: ignore
-        
-        def _traverse(ast: ASTNode | None | tuple | frozenset):
-            if ast is None:
-                return
-            if isinstance(ast, (tuple, frozenset)):
-                for item in ast:
-                    yield from _traverse(item)
-                return
-            elif not isinstance(ast, ASTNode):
-                return
-            if ast.node_type == 'SymbolPostfix':
-                symbol = ast.attributes.get('symbol')
-                if symbol is None:
-                    return
-                if symbol.node_type == 'Symbol' and symbol.attributes.get('symbol_type') not in ('greek', 'letter'):
-                    return
-                yield ast
-            elif ast.node_type == 'Symbol':
-                if ast.attributes.get('symbol_type') in ('greek', 'letter'):
-                    yield ast
-            for value in ast.attributes.values():
-                yield from _traverse(value)
-        return _traverse(ast)
\ No newline at end of file
+            # Parsed from columnar tokens; on errors the interpreter parses it again to locate them
+            ast = parse_columns(tokenize_many((latex,)), 0)
+        except NotParsed:
+            try:
+                interpreter = self._interpreters.get_nowait()
+            except queue.Empty:
+                interpreter = LaTeXMathInterpreter()
+            try:
+                ast = interpreter.parse(latex, file=file, line=line, column=column)
+            except (MathSyntaxError, MathValueError) as e:
+                return CachedError.of(e), e
+            finally:
+                self._interpreters.put(interpreter)
+        return tuple(_traverse(ast)), None
+
+    def _parse_chunk(self, sources: list[str]) -> list[Union[CacheEntry, BaseException]]:
+        entries = []
+        for latex in sources:
+            try:
+                # Errors are stored relative to the source, the location is filled in by the caller
+                entries.append(self._parse(latex, file="", line=1, column=1)[0])
+            except Exception as e:
+                entries.append(e)
+        return entries
+
+
+def _symbols(
+    entry: CacheEntry, error: Optional[MathError],
+    latex: str, file: str, line: int, column: int, ignore_errors: bool
+) -> Iterator[ASTNode]:
+    if isinstance(entry, CachedError):
+        if not ignore_errors:
+            # Errors from cached entries are rebuilt at the location of this occurrence
+            (error or entry.to_error(latex, file, line, column)).display_error()
+        return iter(())
+    return iter(entry)
+
+
+def _chunk_by_length(sources: list[str], jobs: int) -> list[list[str]]:
+    # Parse time grows with the length of the source, so chunks hold about the same number
+    # of characters; a few chunks per worker even out the remaining imbalance
+    target = max(1, sum(map(len, sources)) // (jobs * 4))
+    chunks, chunk, size = [], [], 0
+    for latex in sources:
+        chunk.append(latex)
+        size += len(latex)
+        if size >= target:
+            chunks.append(chunk)
+            chunk, size = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+_worker: Optional[SymbolExtractor] = None
+
+
+def _init_worker():
+    global _worker
+    _worker = SymbolExtractor()
+
+
+def _extract_chunk(sources: list[str]) -> tuple[list[Union[CacheEntry, BaseException]], Counter[str]]:
+    assert _worker is not None, "Worker not initialized"
+    entries = _worker._parse_chunk(sources)
+    # The counts of this chunk only, as the worker outlives the call that submitted it
+    counters, _worker.counters = _worker.counters, Counter()
+    return entries, counters
+
+
+def _traverse(ast: ASTNode | None | tuple | frozenset):
+    if ast is None:
+        return
+    if isinstance(ast, (tuple, frozenset)):
+        for item in ast:
+            yield from _traverse(item)
+        return
+    elif not isinstance(ast, ASTNode):
+        return
+    if ast.node_type == 'SymbolPostfix':
+        symbol = ast.symbol
+        if symbol is None:
+            return
+        if symbol.node_type == 'Symbol' and symbol.symbol_type not in ('greek', 'letter'):
+            return
+        yield ast
+    elif ast.node_type == 'Symbol':
+        if ast.symbol_type in ('greek', 'letter'):
+            yield ast
+    for value in ast.values:
+        yield from _traverse(value)
@@ -0,0 +1,140 @@
+"""Fast path for trivial math, built without the LALR parser.
+
+Most inline math is a few symbols with scripts: `x`, `\\alpha`, `x_t`, `\\bm p^l_t`,
+`x_{t+1}`, `a = b`. `parse_trivial` recognizes these shapes with one regular expression
+and a small recursive descent over its tokens, and builds the same tree the parser would.
+Anything else, including anything the parser would reject, is left to the parser.
+"""
+from functools import lru_cache
+from typing import Optional, Union
+import re
+from .lexer import COMMANDS, UnionRegex, lexer_config, longest_command
+from .mast import ASTNode
+from .parser import freeze
+
+# Tokens the fast path knows, lexed like the PLY lexer does. Commands are classified
+# through the lexer's command table afterwards.
+_TOKEN = re.compile(
+    r'[ \t\r\n]*(?:'
+    r'(?P<letter>[a-zA-Z])'
+    r'|(?P<number>[0-9])'
+    r'|(?P<command>\\[a-zA-Z]+)'
+    rf'|(?P<other>{UnionRegex([re.escape(s) for s in lexer_config["symbol"]["OTHER_SYMBOL"] if not s[1:].isalpha()])})'
+    r"|(?P<script>[_^'])"
+    r'|(?P<brace>[{}])'
+    r')'
+)
+_COMMAND_KINDS = {
+    'GREEK_SYMBOL': 'greek',
+    'OTHER_SYMBOL': 'other',
+    **dict.fromkeys(lexer_config['format'], 'format'),
+}
+_TRAILING_SPACE = re.compile(r'[ \t\r\n]*')
+_SYMBOL_TYPES = frozenset(('letter', 'number', 'greek', 'other'))
+
+Tokens = list[tuple[str, str]]
+AST = Union[ASTNode, tuple, None]
+
+
+class _NotTrivial(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def _symbol(kind: str, value: str) -> ASTNode:
+    # Leaves are few (letters, digits, Greek letters and a few operators), keep them alive
+    return ASTNode('Symbol', symbol=value, symbol_type=kind)
+
+
+def _tokenize(latex: str) -> Optional[Tokens]:
+    tokens, position, end = [], 0, len(latex)
+    while True:
+        match = _TOKEN.match(latex, position)
+        if match is None:
+            if _TRAILING_SPACE.match(latex, position).end() == end:
+                return tokens
+            return None
+        kind, value = match.lastgroup, match.group(match.lastgroup)
+        if kind == 'command':
+            # A command followed by letters (`\alphab`), or one the fast path does not
+            # build (`\frac`), is left to the parser
+            if longest_command(value) != value or COMMANDS[value] not in _COMMAND_KINDS:
+                return None
+            kind = _COMMAND_KINDS[COMMANDS[value]]
+        tokens.append((kind, value))
+        position = match.end()
+
+
+def parse_trivial(latex: str) -> Optional[AST]:
+    """The tree the parser builds for `latex` if it is trivial math, else None."""
+    tokens = _tokenize(latex)
+    if not tokens:
+        return None
+    try:
+        items, position = _items(tokens, 0)
+    except (_NotTrivial, IndexError):
+        return None
+    return freeze(items) if position == len(tokens) else None
+
+
+def _items(tokens: Tokens, position: int) -> tuple[list, int]:
+    # One or more items, up to a closing brace or the end
+    items = []
+    while position < len(tokens) and tokens[position] != ('brace', '}'):
+        item, position = _item(tokens, position)
+        items.append(item)
+    if not items:
+        raise _NotTrivial  # Empty groups are left to the parser
+    return items, position
+
+
+def _item(tokens: Tokens, position: int) -> tuple[ASTNode, int]:
+    base, position = _base(tokens, position)
+    postfix = []
+    seen = set()
+    while position < len(tokens) and tokens[position][0] == 'script':
+        script, position = _script(tokens, position)
+        if script.node_type in seen:
+            raise _NotTrivial  # Two superscripts or two subscripts: a syntax error
+        seen.add(script.node_type)
+        postfix.append(script)
+    if not postfix:
+        return base, position
+    return ASTNode('SymbolPostfix', symbol=base, postfix=frozenset(postfix)), position
+
+
+def _base(tokens: Tokens, position: int) -> tuple[ASTNode, int]:
+    kind, value = tokens[position]
+    if kind in _SYMBOL_TYPES:
+        return _symbol(kind, value), position + 1
+    if kind == 'format':
+        content, position = _argument(tokens, position + 1)
+        return ASTNode('Format', format=value, content=content), position
+    raise _NotTrivial
+
+
+def _argument(tokens: Tokens, position: int) -> tuple[AST, int]:
+    # A symbol, or a braced group
+    kind, value = tokens[position]
+    if kind in _SYMBOL_TYPES:
+        return _symbol(kind, value), position + 1
+    if (kind, value) == ('brace', '{'):
+        items, position = _items(tokens, position + 1)
+        if tokens[position] != ('brace', '}'):
+            raise _NotTrivial
+        return freeze(items), position + 1
+    raise _NotTrivial
+
+
+def _script(tokens: Tokens, position: int) -> tuple[ASTNode, int]:
+    _, value = tokens[position]
+    if value == "'":
+        return ASTNode('Supscript', value=value), position + 1
+    node_type = 'Supscript' if value == '^' else 'Subscript'
+    kind, command = tokens[position + 1]
+    if kind == 'format':
+        # `x^\bm p`: the format itself, without postfix
+        content, position = _argument(tokens, position + 2)
+        return ASTNode(node_type, value=ASTNode('Format', format=command, content=content)), position
+    value, position = _argument(tokens, position + 1)
+    return ASTNode(node_type, value=value), position
@@ -1,6 +1,6 @@
+import sys
 from typing import Optional
-import ply.yacc as yacc
-import ply.lex as lex
+from ..cache import build_lexer, build_parser
 from .mast import ASTNode
 from .lexer import *
 from .parser import *
@@ -9,8 +9,8 @@ from .parser import *
 class LaTeXMathInterpreter:
 
     def __init__(self, debug: bool = False):
-        self.lexer = lex.lex()
-        self.parser = yacc.yacc(debug=debug, write_tables=False)
+        self.lexer = build_lexer(sys.modules[__name__])
+        self.parser = build_parser(sys.modules[__name__], debug=debug)
     
     def parse(
         self, 
@@ -22,5 +22,8 @@ class LaTeXMathInterpreter:
         setattr(self.lexer, 'source_line', line)
         setattr(self.lexer, 'source_column', column)
         setattr(self.lexer, 'file', file)
+        # Each source is lexed from scratch, even after an error left the lexer in text mode
+        self.lexer.begin('INITIAL')
+        self.lexer.expect_text_brace = False
         result = self.parser.parse(latex, lexer=self.lexer)
         return result
@@ -1,45 +1,87 @@
+import re
 from typing import OrderedDict
 from .exceptions import MathValueError
 
 def UnionRegex(regex_list: list[str]) -> str:
-    return r'(' + r'|'.join(frozenset(regex_list)) + r')'
+    # Longest alternatives first: the order is deterministic (so the cached lexer tables
+    # stay valid across runs) and a symbol is never shadowed by its prefix
+    return r'(' + r'|'.join(sorted(frozenset(regex_list), key=lambda regex: (-len(regex), regex))) + r')'
 
+# Tokens by kind. A regex is a rule of its own; a list holds the spellings of the token,
+# where backslash commands are looked up by `t_command` and the rest form a rule
 lexer_config = OrderedDict({
     'symbol': OrderedDict(
         NUMBER_SYMBOL=r'([0-9])',
         LETTER_SYMBOL=r'([a-zA-Z])',
-        GREEK_SYMBOL=UnionRegex([
-            r'\\alpha', r'\\beta', r'\\gamma', r'\\delta', r'\\epsilon', r'\\zeta', r'\\eta', r'\\theta', r'\\iota', r'\\kappa', r'\\lambda', r'\\mu', r'\\nu', r'\\xi', r'\\pi', r'\\rho', r'\\sigma', r'\\tau', r'\\upsilon', r'\\phi', r'\\chi', r'\\psi', r'\\omega', 
-            r'\\Alpha', r'\\Beta', r'\\Gamma', r'\\Delta', r'\\Epsilon', r'\\Zeta', r'\\Eta', r'\\Theta', r'\\Iota', r'\\Kappa', r'\\Lambda', r'\\Mu', r'\\Nu', r'\\Xi', r'\\Pi', r'\\Rho', r'\\Sigma', r'\\Tau', r'\\Upsilon', r'\\Phi', r'\\Chi', r'\\Psi', r'\\Omega', 
-            r'\\varepsilon', r'\\vartheta', r'\\varpi', r'\\varrho', r'\\varsigma', r'\\varphi', 
-        ]),
-        OTHER_SYMBOL=UnionRegex([
-            r'\\dots', r'\\cdots', r'\\arg', r'\\emptyset', r'\\infty', r'\\max', r'\\min', r'\\sum', r'\\exp',
-            r'\\nolimits', r'\\ln', r'\\log', r'\\partial', r'\\prod', r'\\nabla', r'\\left', r'\\right', r'\\lim', r'\\top',
-            r'\|', r'\\linebreak', r'\\square', r'\\quad', r'\\mid', r'&', r',', r'\.', r'\\prime',
-            r'=', r'\\triangleq', r'\\neq', r'\\approx', r'\\sim', r'<', r'\\leq', r'\\le', r'>', r'\\geq', r'\\ge', r'\\leftarrow', r'\\rightarrow', r'\\Leftarrow', r'\\Rightarrow', r'\\in', r'\\notin', r'\\setminus', r'\\subset', r'\\cup', r'\\circ', r'\\cdot', r'\\to', r'\+', r'-', r'\*', r'/', r'\\times', r'\\div', r':', r'\|', 
-            # r'\\ ', # TODO: add this back in
-            r'\\\\',
-            # TODO: \leq is recognized as \le q
-        ]),
+        GREEK_SYMBOL=[
+            r'\alpha', r'\beta', r'\gamma', r'\delta', r'\epsilon', r'\zeta', r'\eta', r'\theta', r'\iota', r'\kappa', r'\lambda', r'\mu', r'\nu', r'\xi', r'\pi', r'\rho', r'\sigma', r'\tau', r'\upsilon', r'\phi', r'\chi', r'\psi', r'\omega', 
+            r'\Alpha', r'\Beta', r'\Gamma', r'\Delta', r'\Epsilon', r'\Zeta', r'\Eta', r'\Theta', r'\Iota', r'\Kappa', r'\Lambda', r'\Mu', r'\Nu', r'\Xi', r'\Pi', r'\Rho', r'\Sigma', r'\Tau', r'\Upsilon', r'\Phi', r'\Chi', r'\Psi', r'\Omega', 
+            r'\varepsilon', r'\vartheta', r'\varpi', r'\varrho', r'\varsigma', r'\varphi', 
+        ],
+        OTHER_SYMBOL=[
+            r'\dots', r'\cdots', r'\arg', r'\emptyset', r'\infty', r'\max', r'\min', r'\sum', r'\exp',
+            r'\nolimits', r'\ln', r'\log', r'\partial', r'\prod', r'\nabla', r'\left', r'\right', r'\lim', r'\top',
+            r'|', r'\linebreak', r'\square', r'\quad', r'\mid', r'&', r',', r'.', r'\prime',
+            r'=', r'\triangleq', r'\neq', r'\approx', r'\sim', r'<', r'\leq', r'\le', r'>', r'\geq', r'\ge', r'\leftarrow', r'\rightarrow', r'\Leftarrow', r'\Rightarrow', r'\in', r'\notin', r'\setminus', r'\subset', r'\cup', r'\circ', r'\cdot', r'\to', r'+', r'-', r'*', r'/', r'\times', r'\div', r':', 
+            # r'\ ', # TODO: add this back in
+            r'\\',
+        ],
     ),
     'format': OrderedDict(
-        CMD_MATHBF=r'\\mathbf',
-        CMD_MATHBB=r'\\mathbb',
-        CMD_MATHIT=r'\\mathit',
-        CMD_BM=r'\\bm',
-        CMD_MATHCAL=r'\\mathcal',
-        CMD_HAT=r'\\hat',
-        CMD_TILDE=r'\\tilde',
-        CMD_MATHRM=r'\\mathrm',
+        CMD_MATHBF=[r'\mathbf'],
+        CMD_MATHBB=[r'\mathbb'],
+        CMD_MATHIT=[r'\mathit'],
+        CMD_BM=[r'\bm'],
+        CMD_MATHCAL=[r'\mathcal'],
+        CMD_HAT=[r'\hat'],
+        CMD_TILDE=[r'\tilde'],
+        CMD_MATHRM=[r'\mathrm'],
     ),
     'format_text': OrderedDict(
-        CMD_TEXT=r'\\text',
-        CMD_LABEL=r'\\label',
-        OPERATOR_NAME=r'\\operatorname',
+        CMD_TEXT=[r'\text'],
+        CMD_LABEL=[r'\label'],
+        OPERATOR_NAME=[r'\operatorname'],
+    ),
+    'command': OrderedDict(
+        FRAC=[r'\frac'],
+        CMD_SQRT=[r'\sqrt'],
+        CMD_BEGIN=[r'\begin'],
+        CMD_END=[r'\end'],
     ),
 })
 
+# Commands followed by a brace of text, lexed in text mode
+TEXT_COMMANDS = frozenset(('CMD_TEXT', 'CMD_LABEL', 'OPERATOR_NAME', 'CMD_BEGIN', 'CMD_END'))
+
+_COMMAND = re.compile(r'\\[a-zA-Z]+')
+
+# Token type of each backslash command, e.g. `\alpha` -> GREEK_SYMBOL
+COMMANDS: dict[str, str] = {}
+_longest_command = 0
+
+
+def register_command(command: str, token_type: str):
+    """Lex `command`, such as `\\varkappa`, as `token_type`, such as GREEK_SYMBOL, from now on.
+
+    Commands are looked up when lexing, so no lexer table is rebuilt. Register commands
+    before loading a `ParseCache` or `SymbolIndex`: they are keyed by the known commands.
+    """
+    if not _COMMAND.fullmatch(command):
+        raise ValueError(f"Not a command: {command!r}, expected a backslash followed by letters")
+    if token_type not in tokens:
+        raise ValueError(f"Unknown token type {token_type!r}")
+    global _longest_command
+    COMMANDS[command] = token_type
+    _longest_command = max(_longest_command, len(command))
+
+
+def longest_command(word: str):
+    """The longest known command that `word`, a backslash and letters, starts with, or None."""
+    for end in range(min(len(word), _longest_command), 1, -1):
+        if word[:end] in COMMANDS:
+            return word[:end]
+    return None
+
 
 tokens = [
     'CARET', 'UNDERSCORE', 'PRIME',
@@ -54,7 +96,7 @@ tokens = [
 ]
 for key in lexer_config:
     tokens.extend(list(lexer_config[key].keys()))
-tokens = list(set(tokens))
+tokens = sorted(set(tokens))
 
 states = (
     ('textmode', 'exclusive'),
@@ -66,8 +108,6 @@ t_CARET = r'\^'
 t_UNDERSCORE = r'_'
 t_PRIME = r'\''
 t_R_BRACE = r'\}'
-t_FRAC = r'\\frac'
-t_CMD_SQRT = r'\\sqrt'
 t_textmode_ignore = ''
 t_L_PAREN = r'\('
 t_R_PAREN = r'\)'
@@ -76,30 +116,18 @@ t_R_BRACE_TEXT = r'\\}'
 t_L_BRACKET = r'\['
 t_R_BRACKET = r'\]'
 
-def t_OPERATOR_NAME(t):
-    r'\\operatorname'
-    t.lexer.expect_text_brace = True
-    return t
-
-def t_CMD_TEXT(t):
-    r'\\text'
-    t.lexer.expect_text_brace = True
-    return t
-
-
-def t_CMD_LABEL(t):
-    r'\\label'
-    t.lexer.expect_text_brace = True
-    return t
-
-def t_CMD_BEGIN(t):
-    r'\\begin'
-    t.lexer.expect_text_brace = True
-    return t
-
-def t_CMD_END(t):
-    r'\\end'
-    t.lexer.expect_text_brace = True
+def t_command(t):
+    r'\\[a-zA-Z]+'
+    # The letters are scanned at once and the longest known command they start with is
+    # looked up, so `\alphab` is `\alpha` followed by the letter `b`
+    command = longest_command(t.value)
+    if command is None:
+        t_error(t)
+    t.type = token_type = COMMANDS[command]
+    t.value = command
+    t.lexer.lexpos = t.lexpos + len(command)
+    if token_type in TEXT_COMMANDS:
+        t.lexer.expect_text_brace = True
     return t
 
 # Line break in LaTeX (used in align environments)
@@ -165,9 +193,16 @@ def t_textmode_R_BRACE(t):
         return None
 
 for key in lexer_config:
-    for symbol, regex in lexer_config[key].items():
-        if f"t_{symbol}" not in globals():
-            globals()[f"t_{symbol}"] = regex
+    for symbol, spellings in lexer_config[key].items():
+        if isinstance(spellings, str):
+            globals()[f"t_{symbol}"] = spellings
+            continue
+        for spelling in spellings:
+            if _COMMAND.fullmatch(spelling):
+                register_command(spelling, symbol)
+        others = [re.escape(spelling) for spelling in spellings if not _COMMAND.fullmatch(spelling)]
+        if others:
+            globals()[f"t_{symbol}"] = UnionRegex(others)
 
 
 def t_error(t):
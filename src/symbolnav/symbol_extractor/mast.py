@@ -1,5 +1,7 @@
-from itertools import zip_longest
-from typing import Union
+from typing import Iterable, Union
+import hashlib
+import threading
+import weakref
 
 # class HashableASTNode:
 
@@ -58,69 +60,213 @@ from typing import Union
 #             return False
 
 
+# Fields of each node type built by the parser, in the order they are passed to ASTNode()
+NODE_FIELDS = {
+    'Fraction': ('numerator', 'denominator'),
+    'SymbolPostfix': ('symbol', 'postfix'),
+    'GeneralPostfix': ('content', 'postfix'),
+    'FormatOp': ('op', 'content'),
+    'Coated': ('coat_left', 'content', 'coat_right'),
+    'Symbol': ('symbol', 'symbol_type'),
+    'Supscript': ('value',),
+    'Subscript': ('value',),
+    'Format': ('format', 'content'),
+    'FormatText': ('format', 'content'),
+}
+
+# Hash-consing table: structurally identical nodes are built only once and shared
+_interned: 'weakref.WeakValueDictionary[tuple, ASTNode]' = weakref.WeakValueDictionary()
+# `WeakValueDictionary.setdefault` is not atomic: without the lock, threads interning the
+# same structure at once could each store and return their own node
+_interned_lock = threading.Lock()
+_node_classes: dict[str, type['ASTNode']] = {}
+
+
+def _field_getter(index: int):
+    def getter(node: 'ASTNode'):
+        return node._key[index]
+    return getter
+
+
+def _node_class(node_type: str, fields: tuple[str, ...]) -> type['ASTNode']:
+    cls = _node_classes.get(node_type)
+    if cls is None:
+        namespace = {
+            '__slots__': (),
+            'node_type': node_type,
+            'fields': fields,
+            **{field: property(_field_getter(i + 1)) for i, field in enumerate(fields)},
+        }
+        # Threads creating the class at once all get the first one stored
+        cls = _node_classes.setdefault(node_type, type(node_type, (ASTNode,), namespace))
+    return cls
+
+
 class ASTNode:
+    """Immutable, interned AST node.
+
+    Each node type is a slotted subclass whose field values live in a single tuple
+    `(node_type, *values)`, which doubles as the key of the interning table.
+    """
+
+    __slots__ = ('_key', '_hash', '_sort_key', '_fingerprint', '__weakref__')
+    node_type: str
+    fields: tuple[str, ...] = ()
+
+    def __new__(cls, node_type: str, **kwargs):
+        node_cls = _node_class(node_type, NODE_FIELDS.get(node_type, tuple(kwargs)))
+        if len(kwargs) != len(node_cls.fields):
+            raise TypeError(f"{node_type} expects fields {node_cls.fields}, got {tuple(kwargs)}")
+        try:
+            # Children are interned before their parents, so the key hashes and compares in O(width)
+            key = (node_type, *(kwargs[field] for field in node_cls.fields))
+        except KeyError as e:
+            raise TypeError(f"{node_type} expects fields {node_cls.fields}, got {tuple(kwargs)}") from e
+        node = _interned.get(key)
+        if node is None:
+            node = object.__new__(node_cls)
+            object.__setattr__(node, '_key', key)
+            # Convert attributes to a hashable tuple
+            # Sort items by key for consistency
+            object.__setattr__(node, '_hash', hash((node_type, tuple(sorted(
+                (k, hash(v))
+                for k, v in zip(node_cls.fields, key[1:])
+            )))))
+            with _interned_lock:
+                node = _interned.setdefault(key, node)
+        return node
+
+    @property
+    def values(self) -> tuple:
+        return self._key[1:]
+
+    @property
+    def attributes(self) -> dict:
+        """New dict of the fields, for code written against the kwargs-based node.
+
+        Built on every access; read single fields through their properties (`node.symbol`).
+        """
+        return dict(zip(self.fields, self._key[1:]))
+
+    def __reduce__(self):
+        return (_make_node, (self.node_type, self.attributes))
 
-    def __init__(self, node_type: str, **kwargs):
-        self.node_type = node_type
-        self.attributes = kwargs
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.node_type} nodes are immutable")
     
     def __repr__(self):
-        attrs = ', '.join(f"{k}={v}" for k, v in self.attributes.items() if v is not None)
+        attrs = ', '.join(f"{k}={v}" for k, v in zip(self.fields, self._key[1:]) if v is not None)
         return f"{self.node_type}({attrs})"
 
     def __hash__(self) -> int:
-        # Convert attributes to a hashable tuple
-        # Sort items by key for consistency
-        attrs_tuple = tuple(sorted(
-            (k, hash(v)) 
-            for k, v in self.attributes.items()
-        ))
-        return hash((self.node_type, attrs_tuple))
+        return self._hash
     
     def __eq__(self, other: 'ASTNode') -> bool:
-        if not isinstance(other, ASTNode):
+        if self is other:
+            return True
+        if not isinstance(other, ASTNode) or self._hash != other._hash:
             return False
-        return self.node_type == other.node_type and self.attributes == other.attributes
+        return self._key == other._key
     
     def __lt__(self, other: 'ASTNode') -> bool:
         if not isinstance(other, ASTNode):
             raise TypeError(f"Cannot compare ASTNode with {type(other)}")
-        if self.node_type != other.node_type:
-            return self.node_type < other.node_type
-        if self.node_type in ['SymbolPostfix', 'GeneralPostfix']:
-            keyword = 'symbol' if self.node_type == 'SymbolPostfix' else 'content'
-            if self.attributes[keyword] != other.attributes[keyword]:
-                return self.attributes[keyword] < other.attributes[keyword]
-            # if len(self.attributes['postfix']) != len(other.attributes['postfix']):
-            #     return len(self.attributes['postfix']) < len(other.attributes['postfix'])
-            sorted_postfix_s = sorted(self.attributes['postfix'], key=lambda x: x.node_type, reverse=True)
-            sorted_postfix_o = sorted(other.attributes['postfix'], key=lambda x: x.node_type, reverse=True)
-            for postfix_s, postfix_o in zip_longest(sorted_postfix_s, sorted_postfix_o):
-                if postfix_s is None:
-                    return True
-                if postfix_o is None:
-                    return False
-                if type(postfix_s) != type(postfix_o):
-                    return postfix_s.__repr__() < postfix_o.__repr__()
-                if postfix_s != postfix_o:
-                    return postfix_s < postfix_o
-            return False
-        else:
-            for key in self.attributes.keys():
-                if type(self.attributes[key]) != type(other.attributes[key]):
-                    return self.attributes[key].__repr__() < other.attributes[key].__repr__()
-                if self.attributes[key] != other.attributes[key]:
-                    return self.attributes[key] < other.attributes[key]
-            return False
-    
+        return sort_key(self) < sort_key(other)
+
+
+def _sort_key_of(value) -> tuple:
+    # Values of different kinds order like their reprs: 'str' < (tuple) < Node(...)/None
+    if isinstance(value, ASTNode):
+        return sort_key(value)
+    if isinstance(value, str):
+        return (0, value)
+    if isinstance(value, tuple):
+        return (1, tuple(_sort_key_of(item) for item in value))
+    if value is None:
+        return (2, 'None')
+    return (3, repr(value))
+
+
+def sort_key(node: ASTNode) -> tuple:
+    """Canonical sort key of a node, computed once and cached on the node.
+
+    Nodes order by type first. Postfix nodes then order by their symbol/content and
+    their postfixes (superscript before subscript, fewer postfixes first); other nodes
+    order by their fields in declaration order.
+    """
+    try:
+        return node._sort_key
+    except AttributeError:
+        pass
+    if node.node_type in ('SymbolPostfix', 'GeneralPostfix'):
+        base, postfix = node.values
+        key = (2, node.node_type, _sort_key_of(base), tuple(
+            _sort_key_of(item) for item in sorted(postfix, key=lambda x: x.node_type, reverse=True)
+        ))
+    else:
+        key = (2, node.node_type, *(_sort_key_of(value) for value in node.values))
+    object.__setattr__(node, '_sort_key', key)
+    return key
+
+
+# Bytes of a fingerprint; bump the personalization when the encoding changes
+FINGERPRINT_SIZE = 16
+_FINGERPRINT_PERSON = b'symbolnav.ast.1'
+
+
+def _encode(value) -> bytes:
+    # Canonical encoding of a field value, tagged by kind and length-prefixed
+    if isinstance(value, ASTNode):
+        return b'N' + fingerprint(value)
+    if isinstance(value, str):
+        data = value.encode()
+        return b'S' + len(data).to_bytes(4, 'big') + data
+    if value is None:
+        return b'0'
+    if isinstance(value, (tuple, frozenset)):
+        items = [_encode(item) for item in value]
+        if isinstance(value, frozenset):
+            items.sort()  # Sets have no order across processes: sorted by fingerprint
+        return (b'T' if isinstance(value, tuple) else b'F') + len(items).to_bytes(4, 'big') + b''.join(items)
+    data = repr(value).encode()
+    return b'R' + len(data).to_bytes(4, 'big') + data
+
+
+def fingerprint(node: ASTNode) -> bytes:
+    """Stable fingerprint of a node, the same in every process and run, cached on the node.
+
+    Unlike `hash`, which is salted per process, it can key caches, files and results sent
+    between processes. It is a blake2b digest of the node type and fields, children
+    entering as their own fingerprints, so each subtree is digested once. Postfix sets are
+    encoded in fingerprint order, so `x_t^l` and `x^l_t` have the same fingerprint.
+    """
+    try:
+        return node._fingerprint
+    except AttributeError:
+        pass
+    digest = hashlib.blake2b(_encode(node.node_type), digest_size=FINGERPRINT_SIZE, person=_FINGERPRINT_PERSON)
+    for value in node.values:
+        digest.update(_encode(value))
+    value = digest.digest()
+    object.__setattr__(node, '_fingerprint', value)
+    return value
+
+
+def sort_symbols(symbols: Iterable[ASTNode]) -> list[ASTNode]:
+    return sorted(symbols, key=sort_key)
+
+
+def _make_node(node_type: str, attributes: dict) -> ASTNode:
+    return ASTNode(node_type, **attributes)
+
 def to_dict(node: Union[ASTNode, list, str, None], recursive: bool = False):
     if isinstance(node, ASTNode):
         result = {'type': node.node_type}
-        for key, value in node.attributes.items():
+        for key, value in zip(node.fields, node.values):
             if value is not None:
                 result[key] = value
         if recursive:
-            for key, value in node.attributes.items():
+            for key, value in zip(node.fields, node.values):
                 result[key] = to_dict(value, recursive=True)
         return result
     elif isinstance(node, list):
@@ -0,0 +1,108 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Union
+
+from ..cache import cache_dir, grammar_hash
+from . import interpreter
+from .exceptions import MathError
+from .mast import ASTNode
+
+# Bump when the symbols extracted from a parse change without a grammar change
+CACHE_VERSION = 1
+
+
+class CachedError(NamedTuple):
+    """A parse error, stored relative to the math source so it can be re-raised at any location."""
+    error_type: type[MathError]
+    message: str
+    note: Optional[str]
+    pos: int
+
+    @classmethod
+    def of(cls, error: MathError) -> 'CachedError':
+        return cls(type(error), error.detail, error.note, error.abs_pos)
+
+    def to_error(self, latex: str, file: str, line: int, column: int) -> MathError:
+        return self.error_type.at(self.message, latex, self.pos, file, line, column, note=self.note)
+
+
+CacheEntry = Union[tuple[ASTNode, ...], CachedError]
+
+
+class ParseCache:
+    """LRU cache of extraction results keyed by the math source text.
+
+    The key is the exact source text: cached errors are re-raised with positions inside it,
+    so two spans only share an entry when they would report errors at the same offsets.
+    With `path`, entries are loaded from and saved to disk across runs. Threads can share
+    a cache.
+    """
+
+    def __init__(self, maxsize: int = 4096, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path is not None:
+            self.load()
+
+    @staticmethod
+    def default_path() -> Optional[str]:
+        """Path of the persistent cache for the current grammar, or None if caching is disabled."""
+        directory = cache_dir()
+        if directory is None:
+            return None
+        version = f"{CACHE_VERSION}_{grammar_hash(interpreter, 't_')}_{grammar_hash(interpreter, 'p_')}"
+        return os.path.join(directory, f"parse_cache_{version}.pickle")
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, latex: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self.entries.get(latex)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(latex)
+            self.hits += 1
+            return entry
+
+    def put(self, latex: str, entry: CacheEntry):
+        with self._lock:
+            self.entries[latex] = entry
+            self.entries.move_to_end(latex)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'maxsize': self.maxsize}
+
+    def load(self):
+        assert self.path is not None, "No cache path set"
+        try:
+            with open(self.path, 'rb') as f:
+                entries = pickle.load(f)
+        except FileNotFoundError:
+            return
+        except Exception:
+            return  # Unreadable cache, it is overwritten on the next save
+        for latex, entry in list(entries.items())[-self.maxsize:]:
+            self.put(latex, entry)
+
+    def save(self):
+        assert self.path is not None, "No cache path set"
+        tmp_path = f"{self.path}.{os.getpid()}"
+        try:
+            with open(tmp_path, 'wb') as f:
+                with self._lock:
+                    entries = dict(self.entries)
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
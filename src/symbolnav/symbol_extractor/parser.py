@@ -15,27 +15,35 @@ def wrap(content_type):
         return func
     return wrap_inner
 
-def expand(item, next_group):
-    if isinstance(next_group, tuple):
-        return tuple((item, *next_group))
-    elif next_group is not None:
-        return tuple((item, next_group))
-    else:
-        return item
+def freeze(items):
+    # A group is None when empty, the item itself when it has a single one, else a tuple
+    while items and items[-1] is None:
+        items.pop()
+    if not items:
+        return None
+    if len(items) == 1:
+        return items[0]
+    return tuple(items)
 
 def p_math(p):
     """math : group"""
     p[0] = p[1]
 
 
-def p_group_item(p):
-    """group : item group"""
-    p[0] = expand(item=p[1], next_group=p[2])
+def p_group(p):
+    """group : items"""
+    p[0] = freeze(p[1])
 
-def p_group_empty(p):
-    """group : empty"""
+def p_items_item(p):
+    """items : items item"""
+    # Left recursion keeps the parser stack flat and appends in O(1) per item
+    p[1].append(p[2])
     p[0] = p[1]
 
+def p_items_empty(p):
+    """items : empty"""
+    p[0] = []
+
 def p_item_frac(p):
     """item : FRAC L_BRACE group R_BRACE L_BRACE group R_BRACE"""
     p[0] = ASTNode('Fraction', numerator=p[3], denominator=p[6])
@@ -0,0 +1,117 @@
+"""Waiting for files to change, for `snav --watch`.
+
+Uses inotify through ctypes on Linux and polls modification times elsewhere. A change is
+reported only once the files have been quiet for a moment, so the burst of writes of one
+save, or several saves in a row, trigger a single rebuild.
+"""
+from typing import Iterable, Optional
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+
+DEBOUNCE = 0.2  # Seconds without changes before changes are reported
+POLL_INTERVAL = 0.5  # Seconds between checks when inotify is unavailable
+
+# inotify events that can change a file: editors either write it in place or replace it
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+def _signature(path: str) -> Optional[tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _inotify() -> Optional[tuple[ctypes.CDLL, int]]:
+    # libc and an inotify descriptor, or None where inotify is unavailable
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+    except (OSError, AttributeError):
+        return None
+    return (libc, fd) if fd >= 0 else None
+
+
+class Watcher:
+    """Waits for any of a set of files to change.
+
+    inotify watches the directories of the files, as saving by replacing a file drops a
+    watch on the file itself. Events only wake the watcher up: a file counts as changed
+    when its modification time or size differs, so events on other files are ignored.
+    """
+
+    def __init__(self, files: Iterable[str], poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.signatures: dict[str, Optional[tuple[int, int]]] = {}
+        self.directories: set[str] = set()
+        self.inotify = _inotify()
+        self.watch(files)
+
+    def watch(self, files: Iterable[str]):
+        """Watch `files` from now on, instead of the files watched so far."""
+        self.signatures = {path: _signature(path) for path in map(os.path.realpath, files)}
+        if self.inotify is None:
+            return
+        libc, fd = self.inotify
+        for directory in {os.path.dirname(path) for path in self.signatures} - self.directories:
+            if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) >= 0:
+                self.directories.add(directory)
+
+    def close(self):
+        if self.inotify is not None:
+            os.close(self.inotify[1])
+            self.inotify = None
+
+    def _changed(self) -> set[str]:
+        changed = set()
+        for path, signature in self.signatures.items():
+            current = _signature(path)
+            if current != signature:
+                self.signatures[path] = current
+                changed.add(path)
+        return changed
+
+    def _poll(self, timeout: Optional[float]) -> set[str]:
+        # Files changed within `timeout` seconds (None to wait for as long as it takes)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.inotify is not None:
+                fd = self.inotify[1]
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                if select.select([fd], [], [], remaining)[0]:
+                    try:
+                        while os.read(fd, 1 << 16):
+                            pass
+                    except BlockingIOError:
+                        pass  # All events read
+            else:
+                step = self.poll_interval if deadline is None else min(self.poll_interval, max(deadline - time.monotonic(), 0))
+                time.sleep(step)
+            changed = self._changed()
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def wait(self, debounce: float = DEBOUNCE) -> set[str]:
+        """Block until watched files change, then until they stay unchanged for `debounce` seconds.
+
+        Returns the real paths of all files that changed meanwhile.
+        """
+        changed = self._poll(None)
+        while True:
+            more = self._poll(debounce)
+            if not more:
+                return changed
+            changed |= more
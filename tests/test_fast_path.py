@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+from symbolnav import MathSyntaxError, MathValueError, SymbolExtractor
+from symbolnav.symbol_extractor.fast_path import parse_trivial
+
+TOKENS = [
+    'x', 'y', 'T', '0', '1', r'\alpha', r'\Omega', r'\varphi', r'\bm', r'\mathbb', r'\hat',
+    '+', '-', '=', ',', '.', '|', '\\\\', r'\cdot', r'\le', r'\leq', r'\infty', r'\frac', r'\text',
+    '_', '^', "'", '{', '}', ' ', r'\alpha b', r'\alphab', r'\bmp', r'\sum', '(', ')',
+]
+SYMBOLS = ['x', 'y', 'T', 'p', '0', '1', '9', r'\alpha', r'\Omega', r'\varphi', r'\infty']
+OPERATORS = ['+', '-', '=', ',', r'\cdot', r'\le', r'\leq']
+FORMATS = [r'\bm', r'\mathbb', r'\hat', r'\mathcal']
+
+
+def _symbol(rng: random.Random) -> str:
+    symbol = rng.choice(SYMBOLS)
+    if rng.random() < 0.3:
+        symbol = f"{rng.choice(FORMATS)}{rng.choice([' ' + symbol, '{' + symbol + '}'])}"
+    return symbol
+
+
+def _group(rng: random.Random) -> str:
+    terms = [_symbol(rng) for _ in range(rng.randint(1, 3))]
+    # Commands need a space before a following letter, other operators are tried without one
+    return ''.join(term + rng.choice([op + ' ' for op in OPERATORS] + OPERATORS[:4]) for term in terms[:-1]) + terms[-1]
+
+
+def _trivial(rng: random.Random) -> str:
+    # Symbols with primes and scripts, joined by operators: the shapes the fast path is for
+    terms = []
+    for _ in range(rng.randint(1, 3)):
+        scripts = rng.sample('_^', rng.randint(0, 2))
+        # A prime is a superscript of its own, so it only goes with a subscript
+        term = _symbol(rng) + ("'" if '^' not in scripts and rng.random() < 0.5 else '')
+        for script in scripts:
+            term += script + (_symbol(rng) if rng.random() < 0.5 else '{' + _group(rng) + '}')
+        terms.append(term)
+    return f" {rng.choice(OPERATORS)} ".join(terms)
+
+
+def _parse(extractor: SymbolExtractor, latex: str):
+    try:
+        return extractor.interpreter.parse(latex, file="", line=1, column=1)
+    except (MathSyntaxError, MathValueError, SyntaxError):
+        return None
+
+
+def _check(extractor: SymbolExtractor, latex: str) -> bool:
+    fast = parse_trivial(latex)
+    if fast is None:
+        return False
+    assert fast == _parse(extractor, latex), latex
+    return True
+
+
+def test_trivial_shapes_match_parser():
+    rng, extractor = random.Random(0), SymbolExtractor()
+    sources = [_trivial(rng) for _ in range(3000)]
+    accepted = sum(_check(extractor, latex) for latex in sources)
+    # Most of these shapes must take the fast path, or the check above proves little
+    assert accepted > len(sources) * 0.9
+
+
+def test_random_tokens_match_parser():
+    # Includes sources the parser rejects, which the fast path must leave to it
+    rng, extractor = random.Random(1), SymbolExtractor()
+    for _ in range(5000):
+        _check(extractor, ''.join(rng.choice(TOKENS) for _ in range(rng.randint(1, 8))))
+
+
+@pytest.mark.parametrize("jobs, threads", [(1, False), (2, True), (2, False)])
+def test_counters(jobs, threads):
+    rng = random.Random(2)
+    sources = list(dict.fromkeys(
+        [_trivial(rng) for _ in range(300)] + [rf"\frac{{{_trivial(rng)}}}{{2}}" for _ in range(100)]
+    ))
+    extractor = SymbolExtractor()
+    extractor.extract_entries([(latex, "", 1, 1) for latex in sources], jobs=jobs, threads=threads)
+    fast = sum(parse_trivial(latex) is not None for latex in sources)
+    assert extractor.counters == {'fast_path': fast, 'parser': len(sources) - fast}
+    assert extractor.fast_path_ratio == fast / len(sources)
@@ -0,0 +1,75 @@
+import io
+import random
+
+from symbolnav.lsp import LanguageServer, read_message
+
+BLOCK = r"""% a comment with $x$ math that should be skipped
+We denote by $x^l_t$ the token and $\bm p_t$ the distribution, with $x_t^l$ again.
+The draft tokens $x^s_t$ and \(\eta^r_t\) and $\alpha$ and $\mathbf{W}_{i,j}$ appear.
+Costs are 5\$ and 10\% here.
+\begin{equation}
+\bm p_t(x) = \eta^l_t \bm p^l_t(x) + \eta^r_t \bm p^r_t(x)
+\end{equation}
+$$
+\begin{aligned}
+P(x=\tilde x^l_t) &= \bm p^l_t(\tilde x^l_t) + \eta^r_t \\
+&= \frac{a_1 + b^2}{c_{k+1}} \leq \sum_{i} w_i
+\end{aligned}
+$$
+\[ f(x) = \sqrt{x^2 + y^2} \cdot \text{norm}(z) \]
+And a broken one $(1-\eta^r_t\delta)-\sum \bm p^l_t\bm p_t=\eta^l_t(1-\sum\bm (p_t^l)^2)$ here.
+\begin{equation*}
+c^l_\text{trans} = x' + \hat{y} + \mathcal{L}
+\end{equation*}
+Finally $D^s$ and $\{x_1, x_2\}$ and $\left( a \right)$ done.
+
+"""
+URI = "file:///paper.tex"
+
+
+def paper(blocks: int) -> str:
+    return "\\documentclass{article}\n\\begin{document}\n" + BLOCK * blocks + "\\end{document}\n"
+
+
+def _open(text: str) -> tuple[LanguageServer, io.BytesIO]:
+    out = io.BytesIO()
+    server = LanguageServer(io.BytesIO(), out)
+    server.did_open({"textDocument": {"uri": URI, "text": text, "version": 0}})
+    return server, out
+
+
+def _last_diagnostics(out: io.BytesIO) -> list:
+    out.seek(0)
+    diagnostics = None
+    while (message := read_message(out)) is not None:
+        diagnostics = message["params"]["diagnostics"]
+    return diagnostics
+
+
+def _position(text: str, offset: int) -> dict:
+    line_start = text.rfind("\n", 0, offset) + 1
+    return {"line": text.count("\n", 0, offset), "character": len(text[line_start:offset].encode("utf-16-le")) // 2}
+
+
+def test_edits_match_open(capsys):
+    # After each edit the parse results and diagnostics are those of opening the new text
+    rng = random.Random(0)
+    text = paper(20)
+    server, out = _open(text)
+    for version in range(1, 200):
+        start = rng.randrange(len(text) + 1)
+        end = min(len(text), start + rng.choice([0, 0, 1, 3]))
+        new_text = rng.choice(["y", "+", "\n", "$", "}", "{", "\\alpha", "é", "😀", "\\(", "_", ""])
+        range_ = {"start": _position(text, start), "end": _position(text, end)}
+        text = text[:start] + new_text + text[end:]
+        server.did_change({
+            "textDocument": {"uri": URI, "version": version},
+            "contentChanges": [{"range": range_, "text": new_text}],
+        })
+        fresh, fresh_out = _open(text)
+        document, fresh_document = server.documents[URI], fresh.documents[URI]
+        assert document.text == text
+        assert document.table.spans == fresh_document.table.spans
+        assert document.entries == fresh_document.entries
+        assert _last_diagnostics(out) == _last_diagnostics(fresh_out)
+
@@ -0,0 +1,23 @@
+import threading
+
+from symbolnav import ASTNode
+
+
+def test_interning_across_threads():
+    # Threads building the same structures at once all get the same nodes
+    barrier = threading.Barrier(8)
+    results: list[list[ASTNode]] = [[] for _ in range(8)]
+
+    def build(result: list[ASTNode]):
+        barrier.wait()
+        for i in range(2000):
+            symbol = ASTNode('Symbol', symbol=f"x_{{{i}}}", symbol_type='var')
+            result.append(ASTNode('SymbolPostfix', symbol=symbol, postfix=(ASTNode('Subscript', value=symbol),)))
+
+    threads = [threading.Thread(target=build, args=(result,)) for result in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for result in results[1:]:
+        assert all(a is b for a, b in zip(result, results[0]))
@@ -0,0 +1,47 @@
+import socket
+
+from symbolnav.client import send
+from symbolnav.server import _handle, _respond
+
+PAPER = r"""\documentclass{article}
+\begin{document}
+Let $x_t$ be the input and $\alpha$ a rate, so $x_t + \alpha$ moves.
+\end{document}
+"""
+
+
+def test_malformed_request():
+    # Answered with an error, the daemon keeps serving
+    daemon, client = socket.socketpair()
+    with daemon, client:
+        client.sendall(b'hello\n')
+        response = _respond(daemon)
+    assert response['status'] == 2 and response['stderr'].startswith("Malformed request")
+
+
+def test_silent_client():
+    daemon, client = socket.socketpair()
+    with daemon, client:
+        daemon.settimeout(0.05)
+        assert _respond(daemon) is None
+
+
+def test_client_terminal(tmp_path, monkeypatch):
+    # Styled and wrapped for the client's terminal, not the daemon's redirected output
+    monkeypatch.setenv('SYMBOLNAV_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'paper.tex').write_text(PAPER)
+    message = {'args': ['paper.tex', '-c', '1'], 'cwd': str(tmp_path), 'prog': 'snav'}
+    plain = _handle(message)
+    styled = _handle({**message, 'isatty': True, 'columns': 30})
+    assert plain['status'] == styled['status'] == 0
+    assert '\x1b[' not in plain['stdout'] and '\x1b[' in styled['stdout']
+    assert len(styled['stdout'].splitlines()) > len(plain['stdout'].splitlines())
+
+
+def test_request_round_trip():
+    daemon, client = socket.socketpair()
+    with daemon, client:
+        send(client, {'args': ['--help'], 'cwd': '.'})
+        response = _respond(daemon)
+    assert response['status'] == 0 and 'usage' in response['stdout']
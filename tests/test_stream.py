@@ -0,0 +1,53 @@
+import io
+import random
+import tracemalloc
+
+from symbolnav import LaTeXMathExtractor
+
+PAPER = r"""\section{Model}
+Let $x_t$ be the input at step $t$ and \(h_t = f(W x_t + b)\) its hidden state, where
+\begin{equation}
+    f(z) = \max(0, z), \quad W \in \mathbb{R}^{d \times n}.
+\end{equation}
+The loss is $$\mathcal{L} = \sum_t \| y_t - \hat y_t \|^2$$ and \[ \hat y_t = V h_t. \]
+"""
+
+
+def _spans(path: str, chunk_size: int = 0):
+    extractor = LaTeXMathExtractor()
+    extractor.out = io.StringIO()
+    spans = extractor.stream(path, chunk_size) if chunk_size else extractor.analyze(file=path)
+    records = [(s.value, s.line, s.column, s.contexts) for s in spans]
+    return records, extractor.out.getvalue()
+
+
+def test_stream_matches_analyze(tmp_path):
+    path = tmp_path / "paper.tex"
+    path.write_text(PAPER * 50)
+    for chunk_size in (7, 64, 1000, 1 << 20):
+        assert _spans(str(path), chunk_size) == _spans(str(path))
+
+
+def test_stream_errors_match_analyze(tmp_path):
+    rng = random.Random(0)
+    text = PAPER * 20
+    path = tmp_path / "paper.tex"
+    for _ in range(100):
+        pos = rng.randrange(len(text))
+        path.write_text(text[:pos] + rng.choice([r"\,", "\\", r"\ "]) + text[pos:])
+        records, output = _spans(str(path), rng.choice([7, 31, 200, 1000]))
+        assert (records, output) == _spans(str(path))
+
+
+def test_stream_stops_at_early_error(tmp_path):
+    # An error far from the end of the chunk is reported at once, not retried with a
+    # buffer growing to the whole file
+    path = tmp_path / "early.tex"
+    path.write_text("A\\, b.\n" + PAPER * 8000)
+    tracemalloc.start()
+    records, output = _spans(str(path), 1 << 14)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert records == [] and "line 1" in output
+    assert (records, output) == _spans(str(path))
+    assert peak < 1 << 20